@@ -6,16 +6,22 @@ export default function Products() {
     const [, setError] = useState(null);
 
     useEffect(() => {
+        // The listing is paginated; follow next_after until the last page
         async function fetchProducts() {
             try {
-                const response = await fetch("/products");
-                if (!response.ok) {
-                    throw new Error("Error fetching products");
-                }
-                const data = await response.json();
-                if (data && data.products) {
-                    setProducts(data.products);
-                }
+                const allProducts = [];
+                let after = null;
+                do {
+                    const query = after === null ? "" : `&after=${after}`;
+                    const response = await fetch(`/products?limit=200${query}`);
+                    if (!response.ok) {
+                        throw new Error("Error fetching products");
+                    }
+                    const data = await response.json();
+                    allProducts.push(...((data && data.products) || []));
+                    after = data ? data.next_after : null;
+                } while (after !== null && after !== undefined);
+                setProducts(allProducts);
             } catch (error) {
                 console.error("Error fetching products:", error);
                 setError("Error fetching products");
@@ -71,6 +71,13 @@ const Checkout = () => {
                 }}
                 validationSchema={CheckoutSchema}
                 onSubmit={async (values, actions) => {
+                    const userId = Number(localStorage.getItem("userId"));
+                    if (!userId) {
+                        // Orders belong to a user, so sign in first
+                        window.location.href = "/login";
+                        return;
+                    }
+
                     try {
                         const orderDetails = cartItems.map((item) => ({
                             product_id: item.id,
@@ -83,7 +90,7 @@ const Checkout = () => {
                                 "Content-Type": "application/json",
                             },
                             body: JSON.stringify({
-                                // user_id: ,
+                                user_id: userId,
                                 order_details: orderDetails,
                             }),
                         });
@@ -33,6 +33,10 @@ export default function Login() {
                 throw new Error(errorData.error || "Login failed");
             }
 
+            // Orders are placed for this user, see Checkout
+            const { user_id } = await response.json();
+            localStorage.setItem("userId", user_id);
+
             setLoginSuccess("Login successful!");
             setTimeout(() => history.push("/"), 1000);
         } catch (error) {
@@ -2,47 +2,114 @@
 # app.py
 # here we will have route definitions and logic for our API
 
-import os
+import json
 
 # Standard library imports
-from email.headerregistry import HeaderRegistry
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from functools import wraps
+from urllib.parse import urlencode
 
 # Remote library imports
 # Local imports
-from config import api, app, db
-from dotenv import load_dotenv
-from flask import jsonify, make_response, request
-from flask_restful import Resource
-from helpers import validate_not_blank, validate_type
-from marshmallow import Schema, fields, validate
+from compression import etag_variants
+from config import catalog_cache, create_app, db, limiter
+from facets import (
+    category_counts,
+    rebuild_category_facets_command,
+    record_stock_changes,
+)
+from flask import (
+    Response,
+    current_app,
+    g,
+    jsonify,
+    make_response,
+    request,
+    stream_with_context,
+)
+from flask_restful import Api, Resource
+from helpers import dollar_to_cents, validate_not_blank, validate_type
+from marshmallow import Schema, ValidationError, fields, validate
 from models import Category, Order, OrderDetail, Product, ProductCategory, User
-from sqlalchemy.exc import IntegrityError
-
-# Builds app, set attributes
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DATABASE = os.environ.get(
-    "DB_URI", f"sqlite:///{os.path.join(BASE_DIR, 'instance', 'app.db')}"
+from outbox import enqueue, enqueue_many
+from sales import REPORT_GROUPS, record_sales, sales_report
+from search import rebuild_search_index_command, search_products
+from serializers import (
+    add_line_items,
+    dumps,
+    order_detail_serializer,
+    order_serializer,
+    order_summary_serializer,
+    product_category_serializer,
+    user_serializer,
+)
+from sqlalchemy import (
+    and_,
+    bindparam,
+    insert,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
 )
-load_dotenv()
-app.secret_key = os.environ.get("SECRET_KEY")
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
 
 
-@app.route("/")
 def index():
     return "<h1>Mont Luxe Watch Company Ecommerce Platform</h1>"
 
 
+# This decorator makes a catalog GET conditional. The strong ETag is the catalog version, which every product or category write bumps, so a matching If-None-Match is answered with 304 before any query or serialization runs. With streams=True the endpoint also negotiates NDJSON from the Accept header, so the NDJSON representation gets its own ETag and responses vary on Accept.
+def conditional_catalog(get=None, streams=False):
+    if get is None:
+        return lambda get: conditional_catalog(get, streams=streams)
+
+    @wraps(get)
+    def wrapper(*args, **kwargs):
+        representation = "ndjson" if streams and wants_stream() else None
+        # Compressed responses carry the ETag with a coding suffix; any variant of the current version is still fresh
+        variants = etag_variants(str(catalog_cache.version), representation)
+        matched = next(
+            (tag for tag in variants if request.if_none_match.contains(tag)), None
+        )
+        if matched is not None:
+            response = make_response("", 304)
+            response.set_etag(matched)
+        else:
+            response = get(*args, **kwargs)
+            if response.status_code == 200:
+                response.set_etag(variants[0])
+        if streams:
+            response.vary.add("Accept")
+        return response
+
+    return wrapper
+
+
 class Products(Resource):
+    method_decorators = {"get": [conditional_catalog]}
+
     # TESTED ✅
     def get(self):
         try:
-            products = [product.to_dict() for product in Product.query.all()]
-            products = [
-                product.to_dict(convert_price_to_dollars=True)
-                for product in Product.query.all()
-            ]
-
-            return make_response({"products": products}, 200)
+            # ?ids=1,2,3 fetches those products in one go instead of a listing page
+            if "ids" in request.args:
+                ids = parse_ids(request.args["ids"].split(","))
+                payload = get_products(
+                    ids,
+                    parse_fields(request.args, PRODUCT_FIELDS),
+                    parse_include(request.args),
+                )
+                return make_response(payload, 200)
+            payload = catalog_cache.get_or_load(
+                catalog_cache_key("products"), lambda: list_products(request.args)
+            )
+            return make_response(payload, 200)
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
         except Exception as error:
             return make_response({"error": str(error)}, 500)
 
@@ -75,6 +142,7 @@ class Products(Resource):
             )
             db.session.add(new_product)
             commit_session(db.session)
+            catalog_cache.invalidate()
             return make_response({"new_product": new_product.to_dict()}, 201)
         except IntegrityError:
             return make_response(
@@ -85,11 +153,19 @@ class Products(Resource):
 
 
 class ProductByID(Resource):
+    method_decorators = {"get": [conditional_catalog]}
+
     # TESTED ✅
     def get(self, id):
-        product = Product.query.get(id)
+        try:
+            include = parse_include(request.args)
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
+        product = catalog_cache.get_or_load(f"product:{id}", lambda: get_product(id))
         if product:
-            return make_response(product.to_dict(convert_price_to_dollars=True), 200)
+            if "categories" in include:
+                product = with_categories([product])[0]
+            return make_response(product, 200)
         else:
             return make_response({"error": "Product not found"}, 404)
 
@@ -105,6 +181,7 @@ class ProductByID(Resource):
                     setattr(product, attr, data[attr])
 
                 commit_session(db.session)
+                catalog_cache.invalidate()
 
                 return make_response(product.to_dict(), 202)
 
@@ -120,6 +197,7 @@ class ProductByID(Resource):
             if product:
                 db.session.delete(product)
                 commit_session(db.session)
+                catalog_cache.invalidate()
                 return jsonify({}), 204
             else:
                 return make_response({"error": "Product not found"}), 404
@@ -127,10 +205,65 @@ class ProductByID(Resource):
             return make_response({"error": str(error)}), 500
 
 
+class ProductBatch(Resource):
+    # The same as GET /products?ids= for id sets too long for a URL: a JSON body of
+    # {"ids": [...]}, with an optional ?fields= and ?include=
+    def post(self):
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get("ids"), list):
+            return make_response(
+                {"error": "A JSON body with an ids list is required"}, 400
+            )
+        try:
+            ids = parse_ids(data["ids"])
+            fields = parse_fields(request.args, PRODUCT_FIELDS)
+            include = parse_include(request.args)
+            return make_response(get_products(ids, fields, include), 200)
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
+
+
+class ProductSearch(Resource):
+    method_decorators = {"get": [conditional_catalog]}
+
+    # Ranked full-text search over product names, descriptions, image alt text and category names: ?q=<words>, with optional limit and offset
+    def get(self):
+        try:
+            q = request.args.get("q", "")
+            limit = validate_type(
+                request.args.get("limit", DEFAULT_SEARCH_LIMIT), "limit", int
+            )
+            offset = validate_type(request.args.get("offset", 0), "offset", int)
+            if not 1 <= limit <= MAX_PAGE_SIZE:
+                raise ValueError(f"The limit must be between 1 and {MAX_PAGE_SIZE}.")
+            if offset < 0:
+                raise ValueError("The offset must not be negative.")
+            fields = parse_fields(request.args, PRODUCT_FIELDS)
+            include = parse_include(request.args)
+            products = catalog_cache.get_or_load(
+                catalog_cache_key("search"),
+                lambda: include_related(
+                    select_fields(search_products(q, limit, offset), fields), include
+                ),
+            )
+            return make_response({"products": products}, 200)
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
+
+
 class Users(Resource):
+    # patch and delete check the same credentials as Login, so they share its buckets
+    method_decorators = {
+        "patch": [limiter.limit("login")],
+        "delete": [limiter.limit("login")],
+    }
+
     # TESTED ✅
     def get(self):
-        return make_response([user.to_dict() for user in User.query.all()], 200)
+        try:
+            return serialized_list(user_serializer)
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
 
     # TESTED ✅
     def post(self):
@@ -159,7 +292,10 @@ class Users(Resource):
                 )
             else:
                 return make_response({"error": "Database integrity error."}, 500)
-
+        # E.g. the 503 from a full password hashing queue
+        except HTTPException:
+            db.session.rollback()
+            raise
         except Exception as error:
             db.session.rollback()
             return make_response({"error": "User creation failed: " + str(error)}, 500)
@@ -184,6 +320,9 @@ class Users(Resource):
                 return make_response({"message": "User deleted successfully"}, 200)
             else:
                 return make_response({"error": "Invalid credentials"}, 401)
+        except HTTPException:
+            db.session.rollback()
+            raise
         except Exception as error:
             return make_response({"error": str(error)}, 500)
 
@@ -205,6 +344,9 @@ class Users(Resource):
                 return make_response({"message": "Password updated successfully"}, 200)
             else:
                 return make_response({"error": "Invalid credentials"}, 401)
+        except HTTPException:
+            db.session.rollback()
+            raise
         except Exception as error:
             return make_response({"error": str(error)}, 500)
 
@@ -233,39 +375,135 @@ class Orders(Resource):
     # TESTED ✅
     def get(self):
         try:
-            orders = Order.query.all()
-            return make_response([order.to_dict() for order in orders], 200)
+            return serialized_list(order_serializer)
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
         except Exception as error:
             return make_response({"error": str(error)}, 500)
 
     # TESTED ✅
     def post(self):
-        order_data = request.get_json()
         try:
-            new_order = Order(user_id=order_data["user_id"])
+            order_data = OrderSchema().load(request.get_json())
+        except ValidationError as error:
+            return make_response({"errors": error.messages}, 400)
+
+        try:
+            prices = reserve_stock(order_data["order_details"])
+            lines = price_order_details(order_data["order_details"], prices)
+
+            new_order = Order(
+                user_id=order_data["user_id"],
+                created_at=datetime.utcnow(),
+                total=sum(line["line_total"] for line in lines),
+            )
             db.session.add(new_order)
             db.session.flush()
 
-            for detail in order_data["order_details"]:
-                order_detail = OrderDetail(
-                    order_id=new_order.id,
-                    product_id=detail["product_id"],
-                    quantity=detail["quantity"],
-                )
+            for line in lines:
+                order_detail = OrderDetail(order_id=new_order.id, **line)
                 db.session.add(order_detail)
 
+            day = new_order.created_at.date()
+            record_sales(
+                (day, line["product_id"], line["quantity"], line["line_total"])
+                for line in lines
+            )
+            # Follow-up work runs in worker.py once this transaction commits
+            enqueue("order.created", {"order_id": new_order.id})
             commit_session(db.session)
+            refresh_catalog_cache()
             return make_response({"message": "Order created successfully"}, 201)
+        except InsufficientStockError as error:
+            db.session.rollback()
+            return make_response(
+                {"error": str(error), "product_id": error.product_id}, 409
+            )
         except Exception as e:
             db.session.rollback()
             return make_response({"error": "Order creation failed: " + str(e)}, 500)
 
 
+class BulkOrders(Resource):
+    # Accepts a JSON array or NDJSON (one order per line) of orders shaped like the
+    # POST /orders body and ingests them in chunks. Each chunk is one transaction.
+    def post(self):
+        try:
+            records = parse_bulk_records(request)
+            chunk_size = validate_type(
+                request.args.get(
+                    "chunk_size", current_app.config["BULK_ORDER_CHUNK_SIZE"]
+                ),
+                "chunk_size",
+                int,
+            )
+            if not 1 <= chunk_size <= MAX_BULK_CHUNK_SIZE:
+                raise ValueError(
+                    f"The chunk_size must be between 1 and {MAX_BULK_CHUNK_SIZE}."
+                )
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
+
+        results = []
+        for start in range(0, len(records), chunk_size):
+            results.extend(
+                ingest_order_chunk(records[start : start + chunk_size], start)
+            )
+
+        created = sum(1 for result in results if result["status"] == 201)
+        refresh_catalog_cache()
+        return make_response(
+            {"created": created, "failed": len(results) - created, "results": results},
+            200,
+        )
+
+
+class UserOrders(Resource):
+    # One user's orders, newest first, with line items and product summaries.
+    # ?limit= sets the page size, ?after=<order id> fetches the next page and
+    # ?start= and ?end= (ISO dates, inclusive) narrow the range
+    def get(self, id):
+        if db.session.get(User, id) is None:
+            return make_response({"error": "User not found"}, 404)
+        try:
+            return json_response(list_user_orders(id, request.args))
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
+
+
+class SalesReport(Resource):
+    # Revenue and units between ?start= and ?end= (ISO dates, inclusive; the last
+    # 30 days by default), grouped by day, product or category
+    def get(self):
+        try:
+            # Orders and the daily aggregates are stamped in UTC
+            today = datetime.utcnow().date()
+            end = date.fromisoformat(request.args.get("end", today.isoformat()))
+            start = date.fromisoformat(
+                request.args.get("start", (end - timedelta(days=29)).isoformat())
+            )
+            group_by = request.args.get("group_by", "day")
+            if group_by not in REPORT_GROUPS:
+                raise ValueError(
+                    f"The group_by must be one of {', '.join(REPORT_GROUPS)}."
+                )
+            if start > end:
+                raise ValueError("The start must not be after the end.")
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
+        return make_response(sales_report(start, end, group_by), 200)
+
+
 class OrderSchema(Schema):
     id = fields.Int(dump_only=True)
-    user_id = fields.Int(load_only=True)
+    user_id = fields.Int(load_only=True, required=True)
     created_at = fields.DateTime(dump_only=True)
-    order_details = fields.Nested("OrderDetailSchema", many=True)
+    order_details = fields.Nested(
+        "OrderDetailSchema",
+        many=True,
+        required=True,
+        validate=validate.Length(min=1),
+    )
 
     class Meta:
         model = Order
@@ -276,17 +514,27 @@ class OrderDetails(Resource):
     # TESTED ✅
     def get(self):
         try:
-            order_details = OrderDetail.query.all()
-            return make_response([detail.to_dict() for detail in order_details], 200)
+            return serialized_list(order_detail_serializer)
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
         except Exception as error:
             return make_response({"error": str(error)}, 500)
 
 
 class Categories(Resource):
+    method_decorators = {"get": [conditional_catalog]}
+
     # TESTED ✅
     def get(self):
-        Categories = Category.query.all()
-        return make_response([category.to_dict() for category in Categories], 200)
+        # ?counts=1 adds each category's product, in stock and price bucket counts
+        if request.args.get("counts", "").lower() in ("1", "true"):
+            categories = catalog_cache.get_or_load("categories:counts", category_counts)
+            return make_response(categories, 200)
+        categories = catalog_cache.get_or_load(
+            "categories",
+            lambda: [category.to_dict() for category in Category.query.all()],
+        )
+        return make_response(categories, 200)
 
     # TESTED ✅
     def post(self):
@@ -298,6 +546,7 @@ class Categories(Resource):
             new_category = Category(name=name)
             db.session.add(new_category)
             db.session.commit()
+            catalog_cache.invalidate()
             return make_response({"message": "Category created successfully"}, 201)
         except ValueError as e:
             return make_response({"error": str(e)}, 400)
@@ -307,12 +556,14 @@ class Categories(Resource):
 
 
 class ProductCategories(Resource):
+    method_decorators = {"get": [conditional_catalog(streams=True)]}
+
     # TESTED ✅
     def get(self):
-        product_categories = ProductCategory.query.all()
-        return make_response(
-            [product_category.to_dict() for product_category in product_categories], 200
-        )
+        try:
+            return serialized_list(product_category_serializer)
+        except ValueError as error:
+            return make_response({"error": str(error)}, 400)
 
     # TESTED ✅
     def post(self):
@@ -329,11 +580,17 @@ class ProductCategories(Resource):
             )
             db.session.add(new_product_category)
             db.session.commit()
+            catalog_cache.invalidate()
             return make_response(
                 {"message": "ProductCategory created successfully"}, 201
             )
         except ValueError as e:
             return make_response({"error": str(e)}, 400)
+        except IntegrityError:
+            db.session.rollback()
+            return make_response(
+                {"error": "The product is already in that category."}, 409
+            )
         except Exception as e:
             db.session.rollback()
             return make_response(
@@ -365,6 +622,483 @@ def commit_session(session):
         raise exc
 
 
+# Sort options for the product listing. Each maps to the columns of a composite index on products, ending in id so the order is total and can be used as a keyset cursor.
+PRODUCT_SORTS = {
+    "id": ((Product.id,), False),
+    "price": ((Product.price, Product.id), False),
+    "-price": ((Product.price, Product.id), True),
+    "name": ((Product.name, Product.id), False),
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+DEFAULT_SEARCH_LIMIT = 20
+MAX_BATCH_IDS = 1000
+PRODUCT_INCLUDES = ("categories",)
+PRODUCT_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "price",
+    "item_quantity",
+    "image_url",
+    "imageAlt",
+)
+
+
+STREAM_BATCH_SIZE = 1000
+
+
+# This function tells whether the client asked for a streamed NDJSON response, either with ?stream=1 or by preferring application/x-ndjson in its Accept header.
+def wants_stream():
+    if request.args.get("stream") == "1":
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+# This function returns an already serialized payload as a JSON response, bypassing Flask-RESTful's own encoder.
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype="application/json")
+
+
+# This function answers a list GET from a serializer, honouring the ?fields= sparse fieldset and the NDJSON stream negotiation.
+def serialized_list(serializer):
+    fields = parse_fields(request.args, serializer.fields)
+    if fields is not None:
+        serializer = serializer.only(fields)
+    if wants_stream():
+        return stream_serialized(serializer)
+    return json_response(serializer.load())
+
+
+# This function parses the optional ?fields=a,b sparse fieldset, so clients such as the storefront grid can fetch only what they render. It returns None when every field is wanted and raises ValueError for names not in allowed.
+def parse_fields(args, allowed):
+    if "fields" not in args:
+        return None
+    fields = {field.strip() for field in args["fields"].split(",") if field.strip()}
+    unknown = fields - set(allowed)
+    if not fields or unknown:
+        raise ValueError(
+            f"The fields must be a comma separated subset of {', '.join(allowed)}."
+        )
+    return fields
+
+
+# This function trims product dicts to a sparse fieldset (plus the id, as the serializers do). None keeps every field.
+def select_fields(rows, fields):
+    if fields is None:
+        return rows
+    fields = fields | {"id"}
+    return [{key: value for key, value in row.items() if key in fields} for row in rows]
+
+
+# This function reads the ?include= option of the product endpoints, a comma separated list of related data to embed in each product.
+def parse_include(args):
+    include = {name.strip() for name in args.get("include", "").split(",")} - {""}
+    if include - set(PRODUCT_INCLUDES):
+        raise ValueError(
+            f"The include must be a comma separated subset of {', '.join(PRODUCT_INCLUDES)}."
+        )
+    return include
+
+
+# This function embeds the related data named in include into product dicts.
+def include_related(products, include):
+    if "categories" in include:
+        products = with_categories(products)
+    return products
+
+
+# This function returns copies of product dicts with a "categories" list of category names. The names for the whole set come from one query on the product_categories index rather than the association proxy, which would lazy-load per product. Copies, because the dicts may be shared with the catalog cache.
+def with_categories(products):
+    if not products:
+        return products
+    rows = db.session.execute(
+        select(ProductCategory.product_id, Category.name)
+        .join(Category, Category.id == ProductCategory.category_id)
+        .where(ProductCategory.product_id.in_({product["id"] for product in products}))
+        .order_by(Category.name)
+    )
+    names = defaultdict(list)
+    for product_id, name in rows:
+        names[product_id].append(name)
+    return [{**product, "categories": names[product["id"]]} for product in products]
+
+
+# This function streams a serializer's rows as NDJSON, one object per line. Rows are loaded STREAM_BATCH_SIZE at a time, so memory stays flat however large the table is.
+def stream_serialized(serializer):
+    def generate():
+        for batch in serializer.batches(STREAM_BATCH_SIZE):
+            for row in batch:
+                yield dumps(row) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+# This function builds one page of the product listing. See Products.get for the supported query string options.
+def list_products(args):
+    fields = parse_fields(args, PRODUCT_FIELDS)
+    include = parse_include(args)
+    query = filter_products(Product.query, args)
+    sort = args.get("sort", "id")
+    if sort not in PRODUCT_SORTS:
+        raise ValueError(f"The sort must be one of {', '.join(sorted(PRODUCT_SORTS))}.")
+    limit = validate_type(args.get("limit", DEFAULT_PAGE_SIZE), "limit", int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"The limit must be between 1 and {MAX_PAGE_SIZE}.")
+
+    columns, descending = PRODUCT_SORTS[sort]
+    if "after" in args:
+        query = after_product(query, args["after"], columns, descending)
+    order_by = [column.desc() if descending else column for column in columns]
+
+    # Fetch one extra row so we know whether another page exists
+    page = query.order_by(*order_by).limit(limit + 1).all()
+    next_after = page[limit - 1].id if len(page) > limit else None
+    products = [
+        product.to_dict(convert_price_to_dollars=True) for product in page[:limit]
+    ]
+    return {
+        "products": include_related(select_fields(products, fields), include),
+        "next_after": next_after,
+    }
+
+
+# This function returns the dollar payload for one product, or None if it does not exist.
+def get_product(id):
+    product = db.session.get(Product, id)
+    return product.to_dict(convert_price_to_dollars=True) if product else None
+
+
+# This function validates the ids of a product multi-get and drops repeats, keeping the order they were asked for in.
+def parse_ids(values):
+    ids = list(dict.fromkeys(validate_type(value, "ids", int) for value in values))
+    if not 1 <= len(ids) <= MAX_BATCH_IDS:
+        raise ValueError(f"Between 1 and {MAX_BATCH_IDS} ids are required.")
+    return ids
+
+
+# This function resolves a batch of product ids to their dollar payloads, in the order asked for, and lists the ids that do not exist. Cached payloads are used first and the rest are loaded with a single IN query.
+def get_products(ids, fields=None, include=()):
+    found = catalog_cache.get_or_load_many("product", ids, load_products)
+    products = select_fields([found[id] for id in ids if id in found], fields)
+    return {
+        "products": include_related(products, include),
+        "missing": [id for id in ids if id not in found],
+    }
+
+
+# This function loads the dollar payloads of the given products, keyed by id. Ids that do not exist are left out.
+def load_products(ids):
+    return {
+        product.id: product.to_dict(convert_price_to_dollars=True)
+        for product in Product.query.filter(Product.id.in_(ids))
+    }
+
+
+# This function builds a cache key from a prefix and the request's query string. Arguments are sorted so equivalent URLs share an entry.
+def catalog_cache_key(prefix):
+    return f"{prefix}?{urlencode(sorted(request.args.items(multi=True)))}"
+
+
+# This function applies the optional catalog filters (category name, price range in dollars, in stock) from the query string to a product query.
+def filter_products(query, args):
+    if "category" in args:
+        query = query.filter(
+            Product.id.in_(
+                db.session.query(ProductCategory.product_id)
+                .join(Category)
+                .filter(Category.name == args["category"])
+            )
+        )
+    if "min_price" in args:
+        query = query.filter(Product.price >= dollar_to_cents(args["min_price"]))
+    if "max_price" in args:
+        query = query.filter(Product.price <= dollar_to_cents(args["max_price"]))
+    if args.get("in_stock", "").lower() in ("1", "true"):
+        query = query.filter(Product.item_quantity > 0)
+    return query
+
+
+# This function restricts a product query to the rows after the cursor product in the given sort order. The cursor row is looked up by primary key so every page costs the same no matter how deep it is.
+def after_product(query, after, columns, descending):
+    anchor = db.session.get(Product, validate_type(after, "after", int))
+    if anchor is None:
+        raise ValueError("The after cursor does not match a product.")
+    key = tuple_(*columns)
+    anchor_key = tuple(getattr(anchor, column.key) for column in columns)
+    return query.filter(key < anchor_key if descending else key > anchor_key)
+
+
+# This function builds one page of a user's order history. Pages are keyed on (created_at, id), which the ix_orders_user_id_created_at index serves directly, so a late page costs the same as the first.
+def list_user_orders(user_id, args):
+    limit = validate_type(args.get("limit", DEFAULT_PAGE_SIZE), "limit", int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"The limit must be between 1 and {MAX_PAGE_SIZE}.")
+
+    # Orders placed through the API store created_at with microseconds, but older
+    # rows got CURRENT_TIMESTAMP, which SQLite writes without them, and a bound
+    # datetime always has them. So the bounds are bound as dates and the cursor
+    # compares against the anchor's stored value; neither depends on the format.
+    criteria = [Order.user_id == user_id]
+    if "start" in args:
+        start = date.fromisoformat(args["start"])
+        criteria.append(Order.created_at >= literal(start, db.Date))
+    if "end" in args:
+        end = date.fromisoformat(args["end"]) + timedelta(days=1)
+        criteria.append(Order.created_at < literal(end, db.Date))
+    if "after" in args:
+        after = validate_type(args["after"], "after", int)
+        anchor = select(Order.created_at).where(
+            Order.id == after, Order.user_id == user_id
+        )
+        if db.session.execute(anchor).first() is None:
+            raise ValueError("The after cursor does not match an order of this user.")
+        anchor_created_at = anchor.scalar_subquery()
+        criteria.append(
+            or_(
+                Order.created_at < anchor_created_at,
+                and_(Order.created_at == anchor_created_at, Order.id < after),
+            )
+        )
+
+    # One extra row tells us whether there is another page
+    orders = order_summary_serializer.load(
+        *criteria,
+        limit=limit + 1,
+        order_by=(Order.created_at.desc(), Order.id.desc()),
+    )
+    next_after = orders[limit - 1]["id"] if len(orders) > limit else None
+    return {"orders": add_line_items(orders[:limit]), "next_after": next_after}
+
+
+# Raised when an order line asks for more of a product than is in stock.
+class InsufficientStockError(Exception):
+    def __init__(self, product_id):
+        super().__init__(f"Insufficient stock for product {product_id}.")
+        self.product_id = product_id
+
+
+# This function reserves stock for the lines of an order inside the caller's transaction and returns the price of each product at that moment. Each product gets one conditional UPDATE ... WHERE item_quantity >= qty RETURNING price, so checking, decrementing and reading the purchase price is a single atomic statement and concurrent checkouts cannot oversell. Products are locked in id order so two orders never wait on each other in opposite orders. On a shortfall it raises InsufficientStockError and the caller rolls the whole order back.
+def reserve_stock(order_details):
+    quantities = Counter()
+    for detail in order_details:
+        quantities[detail["product_id"]] += detail["quantity"]
+
+    prices = {}
+    stock_changes = []
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        row = db.session.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.item_quantity >= quantity)
+            .values(item_quantity=Product.item_quantity - quantity)
+            .returning(Product.price, Product.item_quantity)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is None:
+            raise InsufficientStockError(product_id)
+        price, remaining = row
+        prices[product_id] = price
+        stock_changes.append((product_id, price, remaining + quantity, remaining))
+    note_stock_changes(stock_changes)
+    return prices
+
+
+# This function passes stock reserved by a checkout on to the category facets, in the same transaction, and keeps it in g for refresh_catalog_cache once the request has committed. Changes are (product_id, price, old_quantity, new_quantity) tuples.
+def note_stock_changes(changes):
+    changes = list(changes)
+    record_stock_changes(changes)
+    g.setdefault("stock_changes", []).extend(changes)
+
+
+# This function updates the catalog cache for the stock the request's checkouts reserved. Only a product selling out changes listings, in stock filters and facet counts, so only then is the whole catalog invalidated, and with it every ETag. Otherwise just the reserved products' own entries are dropped; listing pages may show their quantity for up to CATALOG_CACHE_TTL, which checkout does not rely on since it reserves against the database.
+def refresh_catalog_cache():
+    changes = g.pop("stock_changes", [])
+    if any(old > 0 >= new for _, _, old, new in changes):
+        catalog_cache.invalidate()
+    elif changes:
+        catalog_cache.drop_many("product", sorted({change[0] for change in changes}))
+
+
+# This function turns validated order lines into OrderDetail column values, capturing the unit price at purchase and the line total in cents.
+def price_order_details(order_details, prices):
+    return [
+        {
+            "product_id": detail["product_id"],
+            "quantity": detail["quantity"],
+            "unit_price": prices[detail["product_id"]],
+            "line_total": prices[detail["product_id"]] * detail["quantity"],
+        }
+        for detail in order_details
+    ]
+
+
+MAX_BULK_CHUNK_SIZE = 5000
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+# This function reads the records of a bulk request. NDJSON lines that are not valid JSON are kept as ValueError placeholders so they are reported per record instead of failing the whole request.
+def parse_bulk_records(req):
+    if req.mimetype == NDJSON_MIMETYPE:
+        records = []
+        for line in req.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                records.append(ValueError("Invalid JSON."))
+        return records
+
+    records = req.get_json(silent=True)
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array or application/x-ndjson body.")
+    return records
+
+
+# This function validates and writes one chunk of bulk orders in a single transaction and returns a result per record. The stock of every product in the chunk is read (and locked where the database supports it) in one query, orders are accepted against it in request order, and the accepted orders are written with executemany-style inserts: one for the stock updates, one for the orders and one for their lines.
+def ingest_order_chunk(records, offset):
+    schema = OrderSchema()
+    results = {}
+    valid = []
+    for index, record in enumerate(records, start=offset):
+        if isinstance(record, ValueError):
+            results[index] = {"index": index, "status": 400, "errors": str(record)}
+            continue
+        try:
+            valid.append((index, schema.load(record)))
+        except ValidationError as error:
+            results[index] = {"index": index, "status": 400, "errors": error.messages}
+
+    product_ids = {
+        detail["product_id"] for _, order in valid for detail in order["order_details"]
+    }
+    stock = {}
+    prices = {}
+    for product_id, item_quantity, price in db.session.execute(
+        select(Product.id, Product.item_quantity, Product.price)
+        .where(Product.id.in_(product_ids))
+        .with_for_update()
+    ):
+        stock[product_id] = item_quantity
+        prices[product_id] = price
+
+    accepted = []
+    reserved = Counter()
+    for index, order in valid:
+        needed = Counter()
+        for detail in order["order_details"]:
+            needed[detail["product_id"]] += detail["quantity"]
+        short = [pid for pid in sorted(needed) if (stock.get(pid) or 0) < needed[pid]]
+        if short:
+            error = InsufficientStockError(short[0])
+            results[index] = {
+                "index": index,
+                "status": 409,
+                "error": str(error),
+                "product_id": error.product_id,
+            }
+            continue
+        for product_id, quantity in needed.items():
+            stock[product_id] -= quantity
+            reserved[product_id] += quantity
+        accepted.append((index, order))
+
+    if accepted:
+        try:
+            order_ids = write_bulk_orders(accepted, reserved, prices, stock)
+            for (index, _), order_id in zip(accepted, order_ids):
+                results[index] = {"index": index, "status": 201, "order_id": order_id}
+        except InsufficientStockError as error:
+            db.session.rollback()
+            for index, _ in accepted:
+                results[index] = {
+                    "index": index,
+                    "status": 409,
+                    "error": "Stock changed during ingestion, retry the order.",
+                    "product_id": error.product_id,
+                }
+        except Exception as error:
+            db.session.rollback()
+            for index, _ in accepted:
+                results[index] = {
+                    "index": index,
+                    "status": 500,
+                    "error": "Order creation failed: " + str(error),
+                }
+    else:
+        db.session.rollback()
+
+    return [results[index] for index in sorted(results)]
+
+
+# This function writes the accepted orders of a chunk, commits and returns the new order ids in the same order. The stock UPDATE keeps the item_quantity >= qty guard so a concurrent writer that got in after the stock was read is detected instead of overselling.
+def write_bulk_orders(accepted, reserved, prices, stock):
+    params = [
+        {"product_id": product_id, "quantity": quantity}
+        for product_id, quantity in sorted(reserved.items())
+    ]
+    products = Product.__table__
+    result = db.session.execute(
+        update(products)
+        .where(
+            products.c.id == bindparam("product_id"),
+            products.c.item_quantity >= bindparam("quantity"),
+        )
+        .values(item_quantity=products.c.item_quantity - bindparam("quantity")),
+        params,
+    )
+    if db.engine.dialect.supports_sane_multi_rowcount and result.rowcount != len(
+        params
+    ):
+        raise InsufficientStockError(params[0]["product_id"])
+
+    created_at = datetime.utcnow()
+    lines = [
+        price_order_details(order["order_details"], prices) for _, order in accepted
+    ]
+    order_ids = db.session.scalars(
+        insert(Order.__table__).returning(
+            Order.__table__.c.id, sort_by_parameter_order=True
+        ),
+        [
+            {
+                "user_id": order["user_id"],
+                "created_at": created_at,
+                "total": sum(line["line_total"] for line in order_lines),
+            }
+            for (_, order), order_lines in zip(accepted, lines)
+        ],
+    ).all()
+    db.session.execute(
+        insert(OrderDetail.__table__),
+        [
+            {"order_id": order_id, **line}
+            for order_id, order_lines in zip(order_ids, lines)
+            for line in order_lines
+        ],
+    )
+    record_sales(
+        (created_at.date(), line["product_id"], line["quantity"], line["line_total"])
+        for order_lines in lines
+        for line in order_lines
+    )
+    # stock holds what is left after the reservations
+    note_stock_changes(
+        (
+            product_id,
+            prices[product_id],
+            stock[product_id] + quantity,
+            stock[product_id],
+        )
+        for product_id, quantity in reserved.items()
+    )
+    enqueue_many("order.created", [{"order_id": order_id} for order_id in order_ids])
+    commit_session(db.session)
+    return order_ids
+
+
 # This function is used to create a category if it does not exist. It first tries to find the category by name. If it's not found, it creates a new one, commits the session
 def get_or_create_category(category_name):
     category = (
@@ -374,10 +1108,13 @@ def get_or_create_category(category_name):
         category = Category(name=category_name)
         db.session.add(category)
         commit_session(db.session)
+        catalog_cache.invalidate()
     return category
 
 
 class Login(Resource):
+    method_decorators = {"post": [limiter.limit("login")]}
+
     # TESTED ✅
     def post(self):
         data = request.get_json()
@@ -391,6 +1128,10 @@ class Login(Resource):
         user = User.query.filter_by(username=username).first()
 
         if user and user.authenticate(password):
+            # Transparently move the stored hash to the configured cost
+            if user.password_needs_rehash():
+                user.password = password
+                commit_session(db.session)
             return make_response(
                 {"message": "Login successful", "user_id": user.id}, 200
             )
@@ -398,14 +1139,27 @@ class Login(Resource):
             return make_response({"error": "Invalid credentials"}, 401)
 
 
-api.add_resource(Products, "/products")
-api.add_resource(Users, "/users")
-api.add_resource(Orders, "/orders")
-api.add_resource(OrderDetails, "/order_details")
-api.add_resource(ProductByID, "/products/<int:id>")
-api.add_resource(Login, "/login")
-api.add_resource(Categories, "/categories")
-api.add_resource(ProductCategories, "/product_categories")
+# This function attaches the index page, every resource and the CLI commands to an application. create_app calls it.
+def register_routes(app):
+    app.add_url_rule("/", "index", index)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(rebuild_category_facets_command)
+
+    api = Api(app)
+    api.add_resource(Products, "/products")
+    api.add_resource(Users, "/users")
+    api.add_resource(Orders, "/orders")
+    api.add_resource(BulkOrders, "/orders/bulk")
+    api.add_resource(OrderDetails, "/order_details")
+    api.add_resource(ProductByID, "/products/<int:id>")
+    api.add_resource(ProductSearch, "/products/search")
+    api.add_resource(ProductBatch, "/products/batch")
+    api.add_resource(Login, "/login")
+    api.add_resource(Categories, "/categories")
+    api.add_resource(ProductCategories, "/product_categories")
+    api.add_resource(UserOrders, "/users/<int:id>/orders")
+    api.add_resource(SalesReport, "/reports/sales")
+
 
 if __name__ == "__main__":
-    app.run(port=8080, debug=True, host="0.0.0.0")
+    create_app().run(port=8080, debug=True, host="0.0.0.0")
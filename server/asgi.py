@@ -0,0 +1,16 @@
+# asgi.py
+# ASGI entry point for servers such as uvicorn or hypercorn. The Flask app is
+# wrapped with asgiref's WsgiToAsgi, which runs each request in a thread pool, so
+# many slow clients can be held open by one event loop. Requires the optional
+# asgiref package:
+#
+#   uvicorn asgi:application --workers 4 --port 8080
+
+from config import create_app
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    raise RuntimeError("The asgiref package is required for the ASGI entry point.")
+
+application = WsgiToAsgi(create_app())
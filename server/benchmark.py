@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# benchmark.py
+# Load-testing harness for the REST API. Seeds a synthetic dataset at a chosen
+# scale, drives the real endpoints in-process (Flask test client) or over HTTP at a
+# chosen concurrency, and reports throughput and latency percentiles as JSON.
+#
+# Point DB_URI at a scratch database before seeding; rows are added to whatever
+# database the app is configured with.
+#
+#   python benchmark.py seed --users 50000 --products 100000 --orders 1000000
+#   python benchmark.py run --concurrency 16 --requests 2000 --output run.json
+#   python benchmark.py run --mode http --url http://localhost:8080 --baseline base.json
+#   python benchmark.py compare run.json base.json --tolerance 0.1
+#   python benchmark.py serializers --rows 20000
+
+# Standard library imports
+import argparse
+import http.client
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+# Remote library imports
+from sqlalchemy import func, select
+
+# Local imports
+from config import create_app, db
+from models import Order, OrderDetail, Product, ProductCategory, User
+from seed import SEED_PASSWORD, bulk_seed
+from serializers import (
+    dumps,
+    order_serializer,
+    product_category_serializer,
+    user_serializer,
+)
+
+# The login scenario would otherwise hit the login rate limit within seconds. An
+# HTTP target needs RATE_LIMIT_ENABLED=false in its own environment.
+app = create_app({"RATE_LIMIT_ENABLED": False})
+
+# Logins use a sample of the users created by seed.py's bulk mode
+LOGIN_SAMPLE_SIZE = 1000
+
+
+# Each scenario returns (method, path, json body) for one request. ids holds the
+# id ranges of the seeded tables, so requests spread over the whole dataset, and a
+# sample of bulk-seeded usernames.
+def products_page(rng, ids):
+    return "GET", f"/products?limit=50&after={rng.randint(*ids['products'])}", None
+
+
+def product_by_id(rng, ids):
+    return "GET", f"/products/{rng.randint(*ids['products'])}", None
+
+
+def list_orders(rng, ids):
+    return "GET", "/orders", None
+
+
+def create_order(rng, ids):
+    body = {
+        "user_id": rng.randint(*ids["users"]),
+        "order_details": [
+            {"product_id": rng.randint(*ids["products"]), "quantity": 1}
+            for _ in range(rng.randint(1, 3))
+        ],
+    }
+    return "POST", "/orders", body
+
+
+def login(rng, ids):
+    username = rng.choice(ids["usernames"])
+    return "POST", "/login", {"username": username, "password": SEED_PASSWORD}
+
+
+def list_order_details(rng, ids):
+    return "GET", "/order_details", None
+
+
+SCENARIOS = {
+    "products": products_page,
+    "product": product_by_id,
+    "orders": list_orders,
+    "create_order": create_order,
+    "login": login,
+    "order_details": list_order_details,
+}
+DEFAULT_SCENARIOS = ("products", "product", "create_order", "login")
+
+
+def dataset_ids():
+    ids = {}
+    for name, model in (("users", User), ("products", Product)):
+        low, high = db.session.execute(
+            select(func.min(model.id), func.max(model.id))
+        ).one()
+        if low is None:
+            raise SystemExit(f"No {name} found; run the seed command first.")
+        ids[name] = (low, high)
+    ids["usernames"] = db.session.scalars(
+        select(User.username)
+        .where(User.username.like("seed.user%"))
+        .limit(LOGIN_SAMPLE_SIZE)
+    ).all()
+    return ids
+
+
+def dataset_counts():
+    return {
+        model.__tablename__: db.session.scalar(select(func.count()).select_from(model))
+        for model in (User, Product, Order, OrderDetail)
+    }
+
+
+# Request drivers. Each thread gets its own client or connection.
+class InProcessDriver:
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, method, path, body):
+        if not hasattr(self._local, "client"):
+            self._local.client = app.test_client()
+        response = self._local.client.open(path, method=method, json=body)
+        return response.status_code
+
+
+class HTTPDriver:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, body):
+        if not hasattr(self._local, "connection"):
+            self._local.connection = http.client.HTTPConnection(self.host, self.port)
+        connection = self._local.connection
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            connection.request(
+                method, path, body=json.dumps(body) if body else None, headers=headers
+            )
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            del self._local.connection
+            return 0
+
+
+def to_ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(driver, scenario, ids, requests, concurrency, seed):
+    make_request = SCENARIOS[scenario]
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(f"{seed}-{scenario}-{worker_id}")
+        count = requests // concurrency + (worker_id < requests % concurrency)
+        local_latencies = []
+        local_errors = 0
+        for _ in range(count):
+            method, path, body = make_request(rng, ids)
+            started = time.perf_counter()
+            status = driver.request(method, path, body)
+            local_latencies.append(time.perf_counter() - started)
+            # 409 is a legitimate stock shortfall, not a failed request
+            if status == 0 or (status >= 400 and status != 409):
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "mean_ms": to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p95_ms": to_ms(percentile(latencies, 0.95)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+    }
+
+
+def compare_reports(current, baseline, tolerance):
+    """
+    Flags scenarios that got slower than the baseline by more than tolerance.
+
+    Args:
+    current (dict): A report produced by the run command.
+    baseline (dict): The stored report to compare against.
+    tolerance (float): Allowed relative change, e.g. 0.1 for 10%.
+
+    Returns:
+    list: One dict per compared scenario with a "regressions" list.
+    """
+    comparisons = []
+    for scenario, result in current["results"].items():
+        base = baseline["results"].get(scenario)
+        if base is None:
+            continue
+        regressions = []
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append("throughput_rps")
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(metric)
+        comparisons.append(
+            {
+                "scenario": scenario,
+                "throughput_rps": [base["throughput_rps"], result["throughput_rps"]],
+                "p95_ms": [base["p95_ms"], result["p95_ms"]],
+                "p99_ms": [base["p99_ms"], result["p99_ms"]],
+                "regressions": regressions,
+            }
+        )
+    return comparisons
+
+
+def print_comparison(comparisons):
+    for comparison in comparisons:
+        status = "REGRESSION" if comparison["regressions"] else "ok"
+        print(
+            f"{comparison['scenario']:<15} {status:<10} "
+            f"rps {comparison['throughput_rps'][0]} -> {comparison['throughput_rps'][1]}  "
+            f"p95 {comparison['p95_ms'][0]} -> {comparison['p95_ms'][1]} ms  "
+            f"p99 {comparison['p99_ms'][0]} -> {comparison['p99_ms'][1]} ms  "
+            f"{' '.join(comparison['regressions'])}"
+        )
+    return any(comparison["regressions"] for comparison in comparisons)
+
+
+# Serializer microbenchmark: the ORM path (query objects, to_dict(), json.dumps)
+# against the column-tuple serializers with their encoder, on the same rows.
+SERIALIZER_CASES = {
+    "Order": (Order.query_with_details, order_serializer),
+    "User": (lambda: User.query, user_serializer),
+    "ProductCategory": (lambda: ProductCategory.query, product_category_serializer),
+}
+
+
+def time_serializer(serialize, repeat):
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        serialize()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def command_serializers(args):
+    results = {}
+    with app.app_context():
+        for name, (query, serializer) in SERIALIZER_CASES.items():
+
+            def orm_path():
+                objects = query().order_by(serializer.model.id).limit(args.rows).all()
+                return json.dumps([item.to_dict() for item in objects])
+
+            def row_path():
+                return dumps(serializer.load(limit=args.rows))
+
+            rows = min(
+                args.rows,
+                db.session.scalar(select(func.count()).select_from(serializer.model)),
+            )
+            if not rows:
+                raise SystemExit(f"No {name} rows found; run the seed command first.")
+            orm_seconds = time_serializer(orm_path, args.repeat)
+            row_seconds = time_serializer(row_path, args.repeat)
+            results[name] = {
+                "rows": rows,
+                "orm_rows_per_s": round(rows / orm_seconds),
+                "serializer_rows_per_s": round(rows / row_seconds),
+                "speedup": round(orm_seconds / row_seconds, 2),
+            }
+    print(json.dumps(results, indent=2))
+
+
+def command_seed(args):
+    with app.app_context():
+        db.create_all()
+        try:
+            bulk_seed(
+                args.users,
+                args.products,
+                args.orders,
+                args.details_per_order,
+                args.seed,
+                hash_each=args.hash_each,
+            )
+        except ValueError as error:
+            raise SystemExit(f"{error} Point DB_URI at an empty database.")
+
+
+def command_run(args):
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    driver = HTTPDriver(args.url) if args.mode == "http" else InProcessDriver()
+    with app.app_context():
+        ids = dataset_ids()
+        counts = dataset_counts()
+    if "login" in scenarios and not ids["usernames"]:
+        raise SystemExit("The login scenario needs users from seed.py --bulk.")
+
+    report = {
+        "meta": {
+            "mode": args.mode,
+            "url": args.url if args.mode == "http" else None,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+            "dataset": counts,
+            "python": platform.python_version(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": {},
+    }
+    for scenario in scenarios:
+        # A short warm-up so connection setup and first-hit caches are not measured
+        run_scenario(
+            driver, scenario, ids, args.concurrency, args.concurrency, args.seed
+        )
+        report["results"][scenario] = run_scenario(
+            driver, scenario, ids, args.requests, args.concurrency, args.seed
+        )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if print_comparison(compare_reports(report, baseline, args.tolerance)):
+            sys.exit(1)
+
+
+def command_compare(args):
+    with open(args.current) as file:
+        current = json.load(file)
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if print_comparison(compare_reports(current, baseline, args.tolerance)):
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mont Luxe API benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = subparsers.add_parser(
+        "seed", help="add a synthetic dataset (seed.py --bulk)"
+    )
+    seed_parser.add_argument("--users", type=int, default=50000)
+    seed_parser.add_argument("--products", type=int, default=100000)
+    seed_parser.add_argument("--orders", type=int, default=1000000)
+    seed_parser.add_argument("--details-per-order", type=int, default=3)
+    seed_parser.add_argument("--seed", type=int, default=42)
+    seed_parser.add_argument("--hash-each", action="store_true")
+    seed_parser.set_defaults(func=command_seed)
+
+    run_parser = subparsers.add_parser("run", help="drive the endpoints")
+    run_parser.add_argument(
+        "--mode", choices=("inprocess", "http"), default="inprocess"
+    )
+    run_parser.add_argument("--url", default="http://localhost:8080")
+    run_parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS))
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--requests", type=int, default=1000)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", help="write the JSON report here")
+    run_parser.add_argument("--baseline", help="compare against this report")
+    run_parser.add_argument("--tolerance", type=float, default=0.1)
+    run_parser.set_defaults(func=command_run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two reports")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1)
+    compare_parser.set_defaults(func=command_compare)
+
+    serializers_parser = subparsers.add_parser(
+        "serializers", help="compare the ORM and column-tuple serializers"
+    )
+    serializers_parser.add_argument("--rows", type=int, default=20000)
+    serializers_parser.add_argument("--repeat", type=int, default=5)
+    serializers_parser.set_defaults(func=command_serializers)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# cache.py
+# Read-through cache for serialized catalog payloads (products and categories).
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import column, select, table, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+# In-process LRU backend. Entries expire after ttl seconds and the least recently
+# used entry is evicted once max_entries is reached. This is the default backend.
+class LRUBackend:
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set_many(self, mapping):
+        for key, value in mapping.items():
+            self.set(key, value)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def size(self):
+        return len(self._entries)
+
+
+# Counters for the in-process backend, kept in the cache_counters table. Every
+# worker process has its own LRU, but they must all agree on the catalog version:
+# it names both the cache namespace and the catalog ETag, so a per-process counter
+# would let one ETag stand for different content in different workers. A counter
+# row is created on first use with its initial value.
+class DatabaseCounters:
+    counters = table("cache_counters", column("key"), column("value"))
+
+    def __init__(self):
+        self._initial = {}
+
+    def init_counter(self, key, value):
+        self._initial[key] = value
+
+    def get_counter(self, key):
+        session = current_app.extensions["sqlalchemy"].session
+        value = session.execute(
+            select(self.counters.c.value).where(self.counters.c.key == key)
+        ).scalar()
+        if value is None:
+            self._create(session, key)
+            return self.get_counter(key)
+        return value
+
+    # Runs after the write it invalidates for has committed, in its own transaction
+    def incr(self, key):
+        session = current_app.extensions["sqlalchemy"].session
+        value = session.execute(
+            update(self.counters)
+            .where(self.counters.c.key == key)
+            .values(value=self.counters.c.value + 1)
+            .returning(self.counters.c.value)
+        ).scalar()
+        if value is None:
+            self._create(session, key)
+            return self.incr(key)
+        session.commit()
+        return value
+
+    # Two workers may race to create the row; the loser's insert does nothing
+    def _create(self, session, key):
+        dialect = session.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        session.execute(
+            insert(self.counters)
+            .values(key=key, value=self._initial.get(key, 0))
+            .on_conflict_do_nothing(index_elements=["key"])
+        )
+        session.commit()
+
+
+# Shared Redis backend so every worker process sees the same entries and the same
+# catalog version. Requires the optional redis package.
+class RedisBackend:
+    def __init__(self, url, ttl=300):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required for a redis:// cache.")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        # Redis evicts on its own policy; the server-side count lives in INFO stats
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.client.get(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value):
+        self.client.set(key, json.dumps(value), ex=self.ttl)
+
+    # One round trip for the whole batch either way
+    def get_many(self, keys):
+        return [
+            None if value is None else json.loads(value)
+            for value in self.client.mget(keys)
+        ]
+
+    def set_many(self, mapping):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipeline.set(key, json.dumps(value), ex=self.ttl)
+        pipeline.execute()
+
+    def delete_many(self, keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def init_counter(self, key, value):
+        self.client.set(key, value, nx=True)
+
+    def get_counter(self, key):
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def size(self):
+        return self.client.dbsize()
+
+
+# Catalog cache shared by the product and category resources. Keys are namespaced
+# by a catalog version, so invalidating is a single counter bump and stale entries
+# simply age out of the backend.
+class CatalogCache:
+    VERSION_KEY = "catalog:version"
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.counters = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("CATALOG_CACHE_URL", None)
+        app.config.setdefault("CATALOG_CACHE_TTL", 300)
+        app.config.setdefault("CATALOG_CACHE_MAX_ENTRIES", 1024)
+
+        url = app.config["CATALOG_CACHE_URL"]
+        ttl = app.config["CATALOG_CACHE_TTL"]
+        if url:
+            self.backend = RedisBackend(url, ttl=ttl)
+            self.counters = self.backend
+        else:
+            self.backend = LRUBackend(
+                max_entries=app.config["CATALOG_CACHE_MAX_ENTRIES"], ttl=ttl
+            )
+            self.counters = DatabaseCounters()
+        # The version also feeds catalog ETags, so start it from the clock rather
+        # than zero; a reset store must never reuse a version it handed out.
+        self.counters.init_counter(self.VERSION_KEY, time.time_ns() // 1000)
+
+    # Read from the shared store once per app context; invalidate() updates it
+    @property
+    def version(self):
+        if has_app_context() and "catalog_version" in g:
+            return g.catalog_version
+        version = self.counters.get_counter(self.VERSION_KEY)
+        if has_app_context():
+            g.catalog_version = version
+        return version
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached payload for key, calling loader to fill it on a miss.
+
+        Args:
+        key (str): The cache key, without the version namespace.
+        loader (callable): Builds the payload. It must be JSON serializable;
+        None means there is nothing to cache.
+
+        Returns:
+        The cached or freshly loaded payload.
+        """
+        namespaced_key = f"catalog:{self.version}:{key}"
+        value = self.backend.get(namespaced_key)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        self._count("misses")
+        value = loader()
+        if value is not None:
+            self.backend.set(namespaced_key, value)
+        return value
+
+    def get_or_load_many(self, prefix, ids, loader):
+        """
+        Returns the cached payloads for a batch of ids, calling loader once for
+        all the misses. Entries are shared with get_or_load under "<prefix>:<id>".
+
+        Args:
+        prefix (str): The key prefix, e.g. "product".
+        ids (list): The ids to look up.
+        loader (callable): Takes the missed ids and returns a dict of id to
+        payload. Ids it leaves out are not cached.
+
+        Returns:
+        dict: id -> payload, for every id found or loaded.
+        """
+        if not ids:
+            return {}
+        namespace = f"catalog:{self.version}:{prefix}"
+        values = self.backend.get_many([f"{namespace}:{id}" for id in ids])
+        found = {id: value for id, value in zip(ids, values) if value is not None}
+        missing = [id for id in ids if id not in found]
+        self._count("hits", len(found))
+        self._count("misses", len(missing))
+        if missing:
+            loaded = loader(missing)
+            self.backend.set_many(
+                {f"{namespace}:{id}": value for id, value in loaded.items()}
+            )
+            found.update(loaded)
+        return found
+
+    def drop_many(self, prefix, ids):
+        """
+        Drops the current entries for a batch of ids, leaving the rest of the
+        catalog (and the version, so every ETag) alone. Other entries that embed
+        these ids, such as listing pages, keep their copy until they expire.
+
+        Args:
+        prefix (str): The key prefix, e.g. "product".
+        ids (list): The ids whose entries to drop.
+        """
+        namespace = f"catalog:{self.version}:{prefix}"
+        self.backend.delete_many([f"{namespace}:{id}" for id in ids])
+
+    def invalidate(self):
+        """Drops every cached catalog payload by bumping the catalog version."""
+        version = self.counters.incr(self.VERSION_KEY)
+        if has_app_context():
+            g.catalog_version = version
+        return version
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "size": self.backend.size(),
+            "version": self.version,
+        }
+
+    def render_metrics(self):
+        stats = self.stats()
+        return [
+            "# TYPE catalog_cache_hits_total counter",
+            f"catalog_cache_hits_total {stats['hits']}",
+            "# TYPE catalog_cache_misses_total counter",
+            f"catalog_cache_misses_total {stats['misses']}",
+            "# TYPE catalog_cache_evictions_total counter",
+            f"catalog_cache_evictions_total {stats['evictions']}",
+            "# TYPE catalog_cache_entries gauge",
+            f"catalog_cache_entries {stats['size']}",
+        ]
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
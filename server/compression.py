@@ -0,0 +1,95 @@
+# compression.py
+# Negotiated response compression. Bodies above COMPRESSION_MIN_SIZE are encoded
+# with brotli (when the optional brotli package is installed) or gzip, whichever
+# the client's Accept-Encoding prefers. Streamed responses are left alone.
+
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "text/css",
+    "text/html",
+    "text/plain",
+}
+
+
+# The content codings this process can produce, in server preference order
+def available_codings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def etag_variants(etag, representation=None):
+    """
+    Lists the ETags a representation may have been sent with: the plain one and
+    one per content coding, since a compressed body needs its own strong ETag.
+
+    Args:
+    etag (str): The ETag of the resource's default, uncompressed representation.
+    representation (str): Names another representation of the same resource,
+    e.g. "ndjson". It suffixes the ETag ahead of any coding suffix.
+
+    Returns:
+    list: The plain ETag followed by its per-coding variants.
+    """
+    if representation is not None:
+        etag = f"{etag}-{representation}"
+    return [etag] + [f"{etag}-{coding}" for coding in available_codings()]
+
+
+class Compression:
+    def __init__(self, app=None):
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 4
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("COMPRESSION_MIN_SIZE", 1024)
+        app.config.setdefault("COMPRESSION_GZIP_LEVEL", 6)
+        # Brotli's higher qualities are meant for static assets, not per request
+        app.config.setdefault("COMPRESSION_BROTLI_QUALITY", 4)
+
+        self.min_size = app.config["COMPRESSION_MIN_SIZE"]
+        self.gzip_level = app.config["COMPRESSION_GZIP_LEVEL"]
+        self.brotli_quality = app.config["COMPRESSION_BROTLI_QUALITY"]
+        app.after_request(self._after_request)
+
+    def compress(self, data, coding):
+        if coding == "br":
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level)
+
+    def _after_request(self, response):
+        response.vary.add("Accept-Encoding")
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        coding = request.accept_encodings.best_match(available_codings())
+        if coding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        response.set_data(self.compress(data, coding))
+        response.headers["Content-Encoding"] = coding
+        etag, weak = response.get_etag()
+        if etag is not None:
+            response.set_etag(f"{etag}-{coding}", weak=weak)
+        return response
@@ -1,41 +1,179 @@
 # config.py
+# Extensions and the application factory. The extensions are created unbound at
+# import and attached to an app by create_app(), so importing a module builds no
+# app and each app (a worker, a test, a script) can be configured on its own.
+
 # Standard library imports
+import os
+import sqlite3
 
 # Remote library imports
+import click
 from flask import Flask
-from flask_bcrypt import Bcrypt
 from flask_cors import CORS
-from flask_marshmallow import Marshmallow
-from flask_migrate import Migrate
-from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, event
+from sqlalchemy.engine import Engine, make_url
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Local imports
+from cache import CatalogCache
+from compression import Compression
+from hashing import PasswordHasher
+from metrics import Metrics
+from ratelimit import RateLimiter
+
+
+# This function builds the SQLAlchemy engine options from the environment. Pool settings apply to every file or server database; an in-memory SQLite database keeps the single shared connection Flask-SQLAlchemy gives it.
+def engine_options(database_uri):
+    url = make_url(database_uri)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+
 
-# Instantiate app, set attributes
-app = Flask(__name__, static_folder="../client/src/assets", static_url_path="/assets")
-CORS(app)
+# SQLite connections get WAL journaling, so readers no longer block on a writer, a busy timeout instead of failing straight away on a locked database, and synchronous=NORMAL, which is durable under WAL and avoids an fsync per commit.
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(
+        f"PRAGMA journal_mode={os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')}"
+    )
+    cursor.execute(
+        f"PRAGMA busy_timeout={int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))}"
+    )
+    cursor.execute(
+        f"PRAGMA synchronous={os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')}"
+    )
+    cursor.close()
+
+
+# This function reads the settings from the environment, loading .env first. It runs when an app is created rather than at import, so every create_app call sees the environment as it is then.
+def settings_from_env():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_uri = os.environ.get("DB_URI", "sqlite:///app.db")
+    return {
+        "SECRET_KEY": os.environ.get("SECRET_KEY"),
+        "SQLALCHEMY_DATABASE_URI": database_uri,
+        "SQLALCHEMY_ENGINE_OPTIONS": engine_options(database_uri),
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        # Compact JSON unless running in debug mode, for both Flask and Flask-RESTful
+        "RESTFUL_JSON": {"separators": (",", ":")},
+        "CATALOG_CACHE_URL": os.environ.get("CATALOG_CACHE_URL"),
+        "CATALOG_CACHE_TTL": int(os.environ.get("CATALOG_CACHE_TTL", 300)),
+        "BCRYPT_LOG_ROUNDS": int(os.environ.get("BCRYPT_LOG_ROUNDS", 12)),
+        "PASSWORD_HASH_WORKERS": int(
+            os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+        ),
+        "PROFILING_ENABLED": os.environ.get("PROFILING_ENABLED") == "true",
+        "BULK_ORDER_CHUNK_SIZE": int(os.environ.get("BULK_ORDER_CHUNK_SIZE", 500)),
+        "COMPRESSION_MIN_SIZE": int(os.environ.get("COMPRESSION_MIN_SIZE", 1024)),
+        "RATE_LIMIT_ENABLED": os.environ.get("RATE_LIMIT_ENABLED", "true") == "true",
+        "RATE_LIMIT_STORAGE_URL": os.environ.get("RATE_LIMIT_STORAGE_URL"),
+        "TRUSTED_PROXIES": int(os.environ.get("TRUSTED_PROXIES", 0)),
+        "RATE_LIMIT_LOGIN_IP": os.environ.get("RATE_LIMIT_LOGIN_IP", "20/minute"),
+        "RATE_LIMIT_LOGIN_USERNAME": os.environ.get(
+            "RATE_LIMIT_LOGIN_USERNAME", "5/minute"
+        ),
+        "OUTBOX_BATCH_SIZE": int(os.environ.get("OUTBOX_BATCH_SIZE", 100)),
+        "OUTBOX_LEASE_SECONDS": int(os.environ.get("OUTBOX_LEASE_SECONDS", 300)),
+        "OUTBOX_MAX_ATTEMPTS": int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 8)),
+        "OUTBOX_RETRY_BASE_SECONDS": float(
+            os.environ.get("OUTBOX_RETRY_BASE_SECONDS", 5)
+        ),
+        "OUTBOX_RETRY_MAX_SECONDS": float(
+            os.environ.get("OUTBOX_RETRY_MAX_SECONDS", 3600)
+        ),
+        "OUTBOX_POLL_INTERVAL": float(os.environ.get("OUTBOX_POLL_INTERVAL", 1)),
+    }
 
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.json.compact = False
 
 # Define metadata, instantiate db
 metadata = MetaData(
     naming_convention={
+        "ix": "ix_%(column_0_label)s",
         "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
     }
 )
 db = SQLAlchemy(metadata=metadata)
-ma = Marshmallow(app)
-migrate = Migrate(app, db)
-db.init_app(app)
 
-bcrypt = Bcrypt(app)
+# bcrypt runs in a process pool sized by PASSWORD_HASH_WORKERS
+password_hasher = PasswordHasher()
+
+# Read-through cache for product and category payloads
+catalog_cache = CatalogCache()
+
+# Request latency, SQL and response size metrics on /metrics
+metrics = Metrics()
+
+# gzip/brotli for larger responses
+compression = Compression()
+
+# Token buckets in front of the credential checks
+limiter = RateLimiter()
+
+
+def create_app(config=None):
+    """
+    Builds the application: settings from the environment, every extension and
+    every resource.
+
+    Args:
+    config (dict): Settings that take precedence over the environment, e.g. a
+    test database URI.
+
+    Returns:
+    Flask: The configured application.
+    """
+    app = Flask(
+        __name__, static_folder="../client/src/assets", static_url_path="/assets"
+    )
+    app.config.update(settings_from_env())
+    if config:
+        app.config.update(config)
+        # Pool settings follow an overridden database unless given explicitly
+        uri = config.get("SQLALCHEMY_DATABASE_URI")
+        if uri and "SQLALCHEMY_ENGINE_OPTIONS" not in config:
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(uri)
+
+    # Behind reverse proxies every request comes from the nearest proxy's address,
+    # so the client IP (which the login rate limit keys on) and scheme are taken
+    # from the X-Forwarded-* headers those proxies set. Only trust as many hops as
+    # are really there, or clients can spoof their address.
+    if app.config["TRUSTED_PROXIES"]:
+        hops = app.config["TRUSTED_PROXIES"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    CORS(app)
+    db.init_app(app)
+    # Flask-Migrate pulls in all of Alembic, and only the `flask db` commands use
+    # it, so it is attached only when the app is built by the Flask CLI
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
+    password_hasher.init_app(app)
+    catalog_cache.init_app(app)
+    metrics.init_app(app)
+    limiter.init_app(app)
+    metrics.register_collector(catalog_cache.render_metrics)
+    metrics.register_collector(limiter.render_metrics)
+    # Registered after metrics so its after_request hook runs first and the
+    # response size metric counts compressed bytes
+    compression.init_app(app)
 
-# Instantiate REST API
-api = Api(app)
+    # The resources import the models, so they load with the first app
+    from app import register_routes
 
-# Instantiate CORS
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+    register_routes(app)
+    return app
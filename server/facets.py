@@ -0,0 +1,322 @@
+# facets.py
+# Facet counts for the storefront's category filters: per category and price
+# bucket, how many products there are and how many of them are in stock. Model
+# events turn product and product_categories writes into count deltas, applied
+# once per flush in the same transaction, so serving the counts reads one row per
+# category and bucket instead of scanning products. Stock writes that bypass the
+# ORM report through record_stock_changes, and rebuild_category_facets recomputes
+# every count to repair drift, e.g. after seed.py's bulk mode.
+
+from bisect import bisect_right
+from collections import defaultdict
+
+import click
+from config import db
+from flask.cli import with_appcontext
+from models import Category, CategoryFacet, Product, ProductCategory
+from sqlalchemy import case, delete, event, func, insert, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+
+# Lower bound of each price bucket, in cents. Changing them needs a rebuild.
+PRICE_BUCKETS = (0, 50000, 100000, 250000, 500000, 1000000)
+FACETED_ATTRIBUTES = ("price", "item_quantity")
+FACETS_KEY = "facet_changes"
+
+
+def price_bucket(price):
+    return max(bisect_right(PRICE_BUCKETS, price) - 1, 0)
+
+
+# The same bucketing as a SQL expression, for the rebuild
+def price_bucket_expression(price):
+    return case(
+        *[
+            (price >= bound, index)
+            for index, bound in reversed(list(enumerate(PRICE_BUCKETS)))
+        ],
+        else_=0,
+    )
+
+
+def category_counts():
+    """
+    Lists every category with its facet counts. The cost depends on the number of
+    categories and price buckets, not on the number of products.
+
+    Returns:
+    list: Category dicts with total and in stock counts, and one entry per price
+    bucket with its bounds in dollars (max is None for the last bucket).
+    """
+    facets = defaultdict(dict)
+    for category_id, bucket, products, in_stock in db.session.execute(
+        select(
+            CategoryFacet.category_id,
+            CategoryFacet.price_bucket,
+            CategoryFacet.products,
+            CategoryFacet.in_stock,
+        )
+    ):
+        facets[category_id][bucket] = (products, in_stock)
+
+    categories = []
+    for category in Category.query.order_by(Category.id):
+        counts = facets[category.id]
+        buckets = []
+        for index, bound in enumerate(PRICE_BUCKETS):
+            products, in_stock = counts.get(index, (0, 0))
+            upper = PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None
+            buckets.append(
+                {
+                    "min": bound / 100,
+                    "max": upper / 100 if upper is not None else None,
+                    "products": products,
+                    "in_stock": in_stock,
+                }
+            )
+        categories.append(
+            {
+                **category.to_dict(),
+                "products": sum(bucket["products"] for bucket in buckets),
+                "in_stock": sum(bucket["in_stock"] for bucket in buckets),
+                "price_buckets": buckets,
+            }
+        )
+    return categories
+
+
+def record_stock_changes(changes):
+    """
+    Updates the in stock counts for stock written without the ORM, such as the
+    conditional UPDATEs that reserve stock for orders.
+
+    Args:
+    changes: Iterable of (product_id, price, old_quantity, new_quantity) tuples,
+    with price in cents.
+    """
+    flipped = {
+        product_id: (price, 1 if (new or 0) > 0 else -1)
+        for product_id, price, old, new in changes
+        if ((old or 0) > 0) != ((new or 0) > 0)
+    }
+    if not flipped:
+        return
+    deltas = defaultdict(lambda: [0, 0])
+    for product_id, category_id in db.session.execute(
+        select(ProductCategory.product_id, ProductCategory.category_id).where(
+            ProductCategory.product_id.in_(flipped)
+        )
+    ):
+        price, change = flipped[product_id]
+        deltas[(category_id, price_bucket(price))][1] += change
+    increment(db.session.connection(), deltas)
+
+
+def rebuild_category_facets():
+    """Recomputes every facet count from products and product_categories and commits."""
+    connection = db.session.connection()
+    bucket = price_bucket_expression(Product.price)
+    connection.execute(delete(CategoryFacet))
+    connection.execute(
+        insert(CategoryFacet).from_select(
+            ["category_id", "price_bucket", "products", "in_stock"],
+            select(
+                ProductCategory.category_id,
+                bucket,
+                func.count(),
+                func.sum(case((Product.item_quantity > 0, 1), else_=0)),
+            )
+            .join(Product, Product.id == ProductCategory.product_id)
+            .group_by(ProductCategory.category_id, bucket),
+        )
+    )
+    db.session.commit()
+
+
+# Adds (products, in stock) deltas keyed by (category_id, price_bucket), creating
+# missing rows. Uses INSERT ... ON CONFLICT DO UPDATE, which SQLite and PostgreSQL
+# both support.
+def increment(connection, deltas):
+    rows = [
+        {
+            "category_id": category_id,
+            "price_bucket": bucket,
+            "products": products,
+            "in_stock": in_stock,
+        }
+        for (category_id, bucket), (products, in_stock) in deltas.items()
+        if products or in_stock
+    ]
+    if not rows:
+        return
+    insert = (
+        postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    )
+    table = CategoryFacet.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=["category_id", "price_bucket"],
+        set_={
+            "products": table.c.products + statement.excluded.products,
+            "in_stock": table.c.in_stock + statement.excluded.in_stock,
+        },
+    )
+    connection.execute(statement, rows)
+
+
+# Model events only note what changed: the products whose price or stock moved,
+# with their values before the flush, and the links added or removed. The deltas
+# are worked out once per flush, when the final rows can be read in two queries.
+def pending_changes(target):
+    session = object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault(
+        FACETS_KEY, {"products": {}, "links": defaultdict(int), "categories": set()}
+    )
+
+
+# The price and stock as last read from the database. Relies on the old values
+# being loaded when the attributes are set, as they are for a fetched product.
+def committed_values(target):
+    state = inspect(target)
+    values = []
+    for key in FACETED_ATTRIBUTES:
+        history = state.attrs[key].history
+        values.append(history.deleted[0] if history.deleted else getattr(target, key))
+    return tuple(values)
+
+
+@event.listens_for(Product, "after_insert")
+def product_inserted(mapper, connection, target):
+    changes = pending_changes(target)
+    if changes is not None:
+        # A new product has no links yet, so it counted nowhere before
+        changes["products"].setdefault(target.id, None)
+
+
+@event.listens_for(Product, "after_update")
+def product_updated(mapper, connection, target):
+    changes = pending_changes(target)
+    state = inspect(target)
+    if changes is not None and any(
+        state.attrs[key].history.has_changes() for key in FACETED_ATTRIBUTES
+    ):
+        changes["products"].setdefault(target.id, committed_values(target))
+
+
+@event.listens_for(Product, "before_delete")
+def product_deleted(mapper, connection, target):
+    changes = pending_changes(target)
+    if changes is not None:
+        changes["products"].setdefault(target.id, committed_values(target))
+
+
+@event.listens_for(ProductCategory, "after_insert")
+def product_category_inserted(mapper, connection, target):
+    changes = pending_changes(target)
+    if changes is not None:
+        changes["links"][(target.product_id, target.category_id)] += 1
+
+
+@event.listens_for(ProductCategory, "after_delete")
+def product_category_deleted(mapper, connection, target):
+    changes = pending_changes(target)
+    if changes is not None:
+        changes["links"][(target.product_id, target.category_id)] -= 1
+
+
+@event.listens_for(ProductCategory, "after_update")
+def product_category_updated(mapper, connection, target):
+    changes = pending_changes(target)
+    if changes is None:
+        return
+    state = inspect(target)
+    old = []
+    for key in ("product_id", "category_id"):
+        history = state.attrs[key].history
+        old.append(history.deleted[0] if history.deleted else getattr(target, key))
+    changes["links"][tuple(old)] -= 1
+    changes["links"][(target.product_id, target.category_id)] += 1
+
+
+# The facet rows go first so the category row can be deleted; the deltas of its
+# cascaded links are then dropped rather than recreating them
+@event.listens_for(Category, "before_delete")
+def category_deleted(mapper, connection, target):
+    connection.execute(
+        delete(CategoryFacet).where(CategoryFacet.category_id == target.id)
+    )
+    changes = pending_changes(target)
+    if changes is not None:
+        changes["categories"].add(target.id)
+
+
+@event.listens_for(Session, "after_flush")
+def apply_facet_changes(session, flush_context):
+    changes = session.info.pop(FACETS_KEY, None)
+    if not changes:
+        return
+    product_ids = set(changes["products"]) | {id for id, _ in changes["links"]}
+    if not product_ids:
+        return
+    connection = session.connection()
+
+    after = {
+        id: (price, quantity)
+        for id, price, quantity in connection.execute(
+            select(Product.id, Product.price, Product.item_quantity).where(
+                Product.id.in_(product_ids)
+            )
+        )
+    }
+    links_after = defaultdict(set)
+    for product_id, category_id in connection.execute(
+        select(ProductCategory.product_id, ProductCategory.category_id).where(
+            ProductCategory.product_id.in_(product_ids)
+        )
+    ):
+        links_after[product_id].add(category_id)
+    added = defaultdict(set)
+    removed = defaultdict(set)
+    for (product_id, category_id), count in changes["links"].items():
+        if count > 0:
+            added[product_id].add(category_id)
+        elif count < 0:
+            removed[product_id].add(category_id)
+
+    # Take each product out of the facets it was in before the flush and put it
+    # into the ones it is in now
+    deltas = defaultdict(lambda: [0, 0])
+    for product_id in product_ids:
+        values_after = after.get(product_id)
+        values_before = changes["products"].get(product_id, values_after)
+        links_before = (links_after[product_id] - added[product_id]) | removed[
+            product_id
+        ]
+        for values, links, sign in (
+            (values_before, links_before, -1),
+            (values_after, links_after[product_id], 1),
+        ):
+            if values is None:
+                continue
+            price, quantity = values
+            for category_id in links - changes["categories"]:
+                totals = deltas[(category_id, price_bucket(price))]
+                totals[0] += sign
+                totals[1] += sign if (quantity or 0) > 0 else 0
+    increment(connection, deltas)
+
+
+# Deltas noted by a flush that was rolled back must not be applied by the next one
+@event.listens_for(Session, "after_soft_rollback")
+def discard_facet_changes(session, previous_transaction):
+    session.info.pop(FACETS_KEY, None)
+
+
+@click.command("rebuild-category-facets")
+@with_appcontext
+def rebuild_category_facets_command():
+    """Rebuild the category facet counts."""
+    rebuild_category_facets()
+    print("Category facets rebuilt.")
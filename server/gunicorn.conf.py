@@ -0,0 +1,49 @@
+# gunicorn.conf.py
+# Gunicorn settings for wsgi.py. Every value can be overridden from the
+# environment (or on the gunicorn command line).
+
+import gc
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', 8080)}")
+
+# One process per core, each serving several requests at once on threads. Requests
+# mostly wait on the database or the password hashing pool, and threads are what
+# let a worker overlap that waiting.
+workers = int(os.environ.get("GUNICORN_WORKERS", cpu_count))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Every worker has its own bcrypt pool, so split the cores between them instead of
+# starting cpu_count hashing processes per worker.
+os.environ.setdefault("PASSWORD_HASH_WORKERS", str(max(1, cpu_count // workers)))
+# Keep enough database connections for every thread of a worker
+os.environ.setdefault("DB_POOL_SIZE", str(threads))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Recycle workers now and then so slow leaks cannot accumulate; the jitter keeps
+# them from all restarting at once.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+# Import and build the app once in the master, then fork the workers from it. The
+# modules, models and mappers are shared copy-on-write instead of being rebuilt
+# by every worker. Nothing in create_app opens a database connection or starts the
+# hashing pool, so no connection or process is shared across the fork.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+
+# Reference counting writes to any object it touches, but the cyclic collector
+# also writes to every object it scans, which would copy the shared pages into
+# each worker. Freezing moves everything allocated so far out of its reach.
+def pre_fork(server, worker):
+    gc.freeze()
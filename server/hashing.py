@@ -0,0 +1,116 @@
+# hashing.py
+# Password hashing off the request thread. bcrypt runs in a bounded process pool so
+# a burst of logins uses the pool's cores instead of every request thread's.
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+
+# These run inside the pool processes, so they must be importable module functions.
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+
+def _check_password(password_hash, password):
+    return bcrypt.checkpw(password, password_hash)
+
+
+# Hashes and checks passwords with a configurable bcrypt cost. With
+# PASSWORD_HASH_WORKERS set to 0 the work runs inline, which is what seeding and
+# one-off scripts want.
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.workers = 0
+        self._slots = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("BCRYPT_LOG_ROUNDS", 12)
+        app.config.setdefault("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+        app.config.setdefault("PASSWORD_HASH_QUEUE_SIZE", 64)
+
+        self.rounds = app.config["BCRYPT_LOG_ROUNDS"]
+        self.workers = app.config["PASSWORD_HASH_WORKERS"]
+        # Bounds the hashes waiting on the pool. Callers beyond it get a 503 at once
+        # rather than holding a request thread while they wait for a slot.
+        self._slots = threading.BoundedSemaphore(
+            self.workers + app.config["PASSWORD_HASH_QUEUE_SIZE"]
+        )
+
+    def generate_password_hash(self, password):
+        if not password:
+            raise ValueError("Password must be non-empty.")
+        return self._run(_hash_password, password.encode("utf-8"), self.rounds)
+
+    def generate_password_hashes(self, password, count):
+        """
+        Hashes one password count times with distinct salts, spreading the work
+        over the whole pool. Meant for seeding, not request handling.
+
+        Args:
+        password (str): The password to hash.
+        count (int): How many hashes to produce.
+
+        Returns:
+        list: The hashes, as strings.
+        """
+        args = ([password.encode("utf-8")] * count, [self.rounds] * count)
+        if not self.workers:
+            return list(map(_hash_password, *args))
+        return list(self._get_executor().map(_hash_password, *args, chunksize=64))
+
+    def check_password_hash(self, password_hash, password):
+        return self._run(
+            _check_password, password_hash.encode("utf-8"), password.encode("utf-8")
+        )
+
+    def needs_rehash(self, password_hash):
+        """
+        Checks whether a stored hash was made with a different cost than the
+        configured BCRYPT_LOG_ROUNDS.
+
+        Args:
+        password_hash (str): A bcrypt hash such as "$2b$12$...".
+
+        Returns:
+        bool: True if the hash should be regenerated.
+        """
+        try:
+            return int(password_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise ServiceUnavailable("Too many password checks in progress.")
+        try:
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    # The pool is created on first use in each process. A pre-fork server forks
+    # workers before any hashing happens, so each worker gets its own pool.
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pid = os.getpid()
+                atexit.register(self._executor.shutdown, wait=False)
+            return self._executor
@@ -113,3 +113,18 @@ def normalize_price_input(price_input):
     ValueError: If the price input is invalid.
     """
     return dollar_to_cents(price_input)
+
+
+def format_datetime(value):
+    """
+    Formats a datetime the same way SerializerMixin does for API payloads.
+
+    Args:
+    value (datetime or None): The datetime to format.
+
+    Returns:
+    str or None: The formatted datetime, or None if no value was given.
+    """
+    if value is None:
+        return None
+    return value.strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,190 @@
+# metrics.py
+# Request-level instrumentation. Records per-route latency, SQL query count and SQL
+# time (from SQLAlchemy engine events) and response size, and serves them on
+# /metrics in the Prometheus text format. With PROFILING_ENABLED set, ?profile=1
+# returns a profiler report for that single request instead of its response.
+
+import cProfile
+import io
+import pstats
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+# Cumulative histogram in the Prometheus sense: each bucket counts observations
+# less than or equal to its upper bound.
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def render(self, name, labels):
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class Metrics:
+    HISTOGRAMS = {
+        "http_request_duration_seconds": (
+            "Time spent handling the request.",
+            LATENCY_BUCKETS,
+        ),
+        "sql_queries_per_request": (
+            "SQL statements executed while handling the request.",
+            QUERY_COUNT_BUCKETS,
+        ),
+        "sql_duration_seconds_per_request": (
+            "Time spent in SQL statements while handling the request.",
+            LATENCY_BUCKETS,
+        ),
+        "http_response_size_bytes": (
+            "Size of the response body. Streamed responses are not counted.",
+            SIZE_BUCKETS,
+        ),
+    }
+
+    def __init__(self, app=None):
+        self.histograms = {name: {} for name in self.HISTOGRAMS}
+        self.requests = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("PROFILING_ENABLED", False)
+        self.profiling_enabled = app.config["PROFILING_ENABLED"]
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule("/metrics", "metrics", self.render_view)
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    def register_collector(self, collector):
+        """
+        Adds a callable whose output is appended to /metrics.
+
+        Args:
+        collector (callable): Returns a list of Prometheus text format lines.
+        """
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP http_requests_total Requests handled.")
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(
+                    f'http_requests_total{{method="{method}",route="{route}",'
+                    f'status="{status}"}} {count}'
+                )
+            for name, (description, _) in self.HISTOGRAMS.items():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), histogram in sorted(self.histograms[name].items()):
+                    labels = f'method="{method}",route="{route}"'
+                    lines.extend(histogram.render(name, labels))
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+    def render_view(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+    def _before_request(self):
+        g.request_started = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_duration = 0.0
+        g.profiler = None
+        if self.profiling_enabled and request.args.get("profile") == "1":
+            g.profiler = start_profiler()
+
+    def _after_request(self, response):
+        if g.get("profiler") is not None:
+            return profile_response(g.profiler)
+        if request.endpoint == "metrics" or "request_started" not in g:
+            return response
+
+        key = (request.method, request.url_rule.rule if request.url_rule else "")
+        observations = {
+            "http_request_duration_seconds": time.perf_counter() - g.request_started,
+            "sql_queries_per_request": g.sql_queries,
+            "sql_duration_seconds_per_request": g.sql_duration,
+        }
+        if not response.is_streamed and response.content_length is not None:
+            observations["http_response_size_bytes"] = response.content_length
+
+        with self._lock:
+            status_key = key + (response.status_code,)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            for name, value in observations.items():
+                histograms = self.histograms[name]
+                if key not in histograms:
+                    histograms[key] = Histogram(self.HISTOGRAMS[name][1])
+                histograms[key].observe(value)
+        return response
+
+
+# Engine events fire on the thread running the statement, so flask.g is the
+# request that issued it. Statements outside a request are not counted. The start
+# time lives on the statement's execution context, which is discarded with it, as
+# a statement that raises never reaches after_cursor_execute.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is not None and has_request_context() and "sql_queries" in g:
+        g.sql_queries += 1
+        g.sql_duration += time.perf_counter() - started
+
+
+# pyinstrument gives a more readable call tree, so it is used when installed
+def start_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    profiler = Profiler()
+    profiler.start()
+    return profiler
+
+
+def profile_response(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(50)
+        report = output.getvalue()
+    else:
+        profiler.stop()
+        report = profiler.output_text()
+    return Response(report, mimetype="text/plain")
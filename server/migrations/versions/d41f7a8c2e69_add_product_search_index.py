@@ -0,0 +1,62 @@
+"""add product search index
+
+Revision ID: d41f7a8c2e69
+Revises: b7e2c94f1d30
+Create Date: 2026-10-17 15:02:47.318920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f7a8c2e69'
+down_revision = 'b7e2c94f1d30'
+branch_labels = None
+depends_on = None
+
+
+# The index is an FTS5 virtual table on SQLite and a tsvector table with a GIN
+# index on PostgreSQL, neither of which autogenerate can express.
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            'CREATE TABLE product_search ('
+            'product_id INTEGER PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE, '
+            'document TSVECTOR NOT NULL)'
+        )
+        op.execute(
+            'CREATE INDEX ix_product_search_document ON product_search USING GIN (document)'
+        )
+        op.execute(
+            "INSERT INTO product_search (product_id, document) "
+            "SELECT id, "
+            "setweight(to_tsvector('english', name), 'A') || "
+            "setweight(to_tsvector('english', coalesce(categories, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(\"imageAlt\", '')), 'C') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'D') "
+            "FROM (SELECT products.*, (SELECT string_agg(categories.name, ' ') "
+            "FROM categories JOIN product_categories "
+            "ON product_categories.category_id = categories.id "
+            "WHERE product_categories.product_id = products.id) AS categories "
+            "FROM products) AS products"
+        )
+    else:
+        op.execute(
+            'CREATE VIRTUAL TABLE product_search USING fts5('
+            'name, description, image_alt, categories, '
+            "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        op.execute(
+            'INSERT INTO product_search (rowid, name, description, image_alt, categories) '
+            "SELECT id, name, coalesce(description, ''), coalesce(imageAlt, ''), "
+            "coalesce((SELECT group_concat(categories.name, ' ') "
+            'FROM categories JOIN product_categories '
+            'ON product_categories.category_id = categories.id '
+            "WHERE product_categories.product_id = products.id), '') "
+            'FROM products'
+        )
+
+
+def downgrade():
+    op.execute('DROP TABLE product_search')
@@ -4,16 +4,17 @@
 # Import necessary modules from SQLAlchemy and SerializerMixin for serialization.
 import re
 
-from config import bcrypt, db
+from config import db, password_hasher
 from helpers import (
     dollar_to_cents,
+    format_datetime,
     validate_not_blank,
     validate_positive_number,
     validate_type,
 )
 from sqlalchemy import MetaData, null
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy.orm import validates
+from sqlalchemy.orm import joinedload, selectinload, validates
 from sqlalchemy_serializer import SerializerMixin
 
 # Models go here!
@@ -48,6 +49,12 @@ class Product(db.Model, SerializerMixin):
 
     serialize_rules = ("-product_categories",)
 
+    # Composite indexes backing the keyset-paginated sort orders on /products
+    __table_args__ = (
+        db.Index("ix_products_price_id", "price", "id"),
+        db.Index("ix_products_name_id", "name", "id"),
+    )
+
     # validations for Product Model
     @validates("name", "description", "image_url", "imageAlt")
     def validate_not_blank(self, key, value):
@@ -112,13 +119,26 @@ class ProductCategory(db.Model, SerializerMixin):
 
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=False)
+    category_id = db.Column(
+        db.Integer, db.ForeignKey("categories.id"), nullable=False, index=True
+    )
 
     product = db.relationship("Product", back_populates="product_categories")
     category = db.relationship("Category", back_populates="product_categories")
 
     serialize_rules = ("-product", "-category")
 
+    # A product is in a category at most once. The unique index also serves
+    # lookups by product_id, so that column needs no index of its own.
+    __table_args__ = (
+        db.Index(
+            "uq_product_categories_product_id_category_id",
+            "product_id",
+            "category_id",
+            unique=True,
+        ),
+    )
+
     @validates("product_id", "category_id")
     def validate_ids(self, key, value):
         value = validate_type(value, key, int)
@@ -154,10 +174,15 @@ class User(db.Model, SerializerMixin):
 
     @password.setter
     def password(self, password):
-        self._password_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+        self._password_hash = password_hasher.generate_password_hash(password)
 
     def authenticate(self, password):
-        return bcrypt.check_password_hash(self._password_hash, password)
+        return password_hasher.check_password_hash(self._password_hash, password)
+
+    # True when the stored hash was made with a different bcrypt cost than the one
+    # configured, so the next successful login can upgrade it.
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self._password_hash)
 
     @validates("email")
     def validate_email(self, key, email):
@@ -171,6 +196,20 @@ class User(db.Model, SerializerMixin):
 
     serialize_rules = ("-orders",)
 
+    # Explicit shape so the password hash never leaves the model
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "username": self.username,
+            "email": self.email,
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "shipping_address": self.shipping_address,
+            "shipping_city": self.shipping_city,
+            "shipping_state": self.shipping_state,
+            "shipping_zip": self.shipping_zip,
+        }
+
 
 # Order Model
 # Represents an order made by a user. An order can contain multiple products.
@@ -179,18 +218,48 @@ class Order(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # Sum of the line totals, in cents
+    total = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     order_details = db.relationship("OrderDetail", back_populates="order")
     user = db.relationship("User", back_populates="orders")
 
+    # Serves a user's order history newest first, and any other lookup by user_id
+    __table_args__ = (
+        db.Index("ix_orders_user_id_created_at", "user_id", "created_at", "id"),
+    )
+
+    # Loads orders with their user (joined) and line items (one extra SELECT ... IN),
+    # so serializing any number of orders costs two queries instead of 2N+1.
+    @classmethod
+    def query_with_details(cls):
+        return cls.query.options(joinedload(cls.user), selectinload(cls.order_details))
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "created_at": format_datetime(self.created_at),
+            "total": self.total,
+            "order_details": [detail.to_dict() for detail in self.order_details],
+            "user": self.user.to_dict() if self.user else None,
+        }
+
 
 # OrderDetail Model
 # Links orders to products and includes the quantity of each product in an order.
 class OrderDetail(db.Model, SerializerMixin):
     __tablename__ = "order_details"
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    order_id = db.Column(
+        db.Integer, db.ForeignKey("orders.id"), nullable=False, index=True
+    )
+    product_id = db.Column(
+        db.Integer, db.ForeignKey("products.id"), nullable=False, index=True
+    )
     quantity = db.Column(db.Integer, nullable=False)
+    # Product price when the order was placed and quantity * unit_price, in cents
+    unit_price = db.Column(db.Integer)
+    line_total = db.Column(db.Integer)
     order = db.relationship("Order", back_populates="order_details")
     product = db.relationship("Product")
 
@@ -198,3 +267,90 @@ class OrderDetail(db.Model, SerializerMixin):
         "-order",
         "-product",
     )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "order_id": self.order_id,
+            "product_id": self.product_id,
+            "quantity": self.quantity,
+            "unit_price": self.unit_price,
+            "line_total": self.line_total,
+        }
+
+
+# DailyProductSales Model
+# Units sold and revenue (in cents, at purchase price) per product per day.
+# Maintained incrementally as orders are placed so sales reports never scan orders.
+class DailyProductSales(db.Model, SerializerMixin):
+    __tablename__ = "daily_product_sales"
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+
+
+# DailyCategorySales Model
+# The same figures rolled up per category. A product in two categories counts
+# towards both.
+class DailyCategorySales(db.Model, SerializerMixin):
+    __tablename__ = "daily_category_sales"
+    day = db.Column(db.Date, primary_key=True)
+    category_id = db.Column(
+        db.Integer, db.ForeignKey("categories.id"), primary_key=True
+    )
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+
+
+# CategoryFacet Model
+# Product counts per category and price bucket, in total and in stock, for the
+# storefront's category filters. Maintained incrementally by facets.py.
+class CategoryFacet(db.Model, SerializerMixin):
+    __tablename__ = "category_facets"
+    category_id = db.Column(
+        db.Integer, db.ForeignKey("categories.id"), primary_key=True
+    )
+    # Index into facets.PRICE_BUCKETS
+    price_bucket = db.Column(db.Integer, primary_key=True)
+    products = db.Column(db.Integer, nullable=False, default=0)
+    in_stock = db.Column(db.Integer, nullable=False, default=0)
+
+
+# OutboxMessage Model
+# Work to run after a transaction commits, such as post-order side effects. A
+# message is written in the same transaction as the change it describes and
+# drained by worker.py, so the work happens if and only if the change committed.
+class OutboxMessage(db.Model, SerializerMixin):
+    __tablename__ = "outbox_messages"
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(100), nullable=False)
+    # JSON document handed to the topic's handler
+    payload = db.Column(db.Text, nullable=False)
+    # "pending" until handled (the row is then deleted) or "dead" once retries run out
+    status = db.Column(
+        db.String(20), nullable=False, default="pending", server_default="pending"
+    )
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Earliest time the next attempt may start, pushed back after each failure
+    available_at = db.Column(db.DateTime, nullable=False)
+    # Set while a worker holds the message; an expired lease frees it again
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    # Serves the worker's poll: pending messages that are due, oldest first
+    __table_args__ = (
+        db.Index(
+            "ix_outbox_messages_status_available_at", "status", "available_at", "id"
+        ),
+    )
+
+
+# CacheCounter Model
+# Named counters shared by every worker process, such as the catalog version that
+# namespaces the in-process catalog cache and makes up the catalog ETags.
+class CacheCounter(db.Model, SerializerMixin):
+    __tablename__ = "cache_counters"
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False)
@@ -0,0 +1,196 @@
+# outbox.py
+# Transactional outbox. Request handlers call enqueue inside the transaction that
+# makes a change and return without doing the follow-up work, so a message exists
+# exactly when the change commits and checkout latency does not grow with every
+# side effect. worker.py drains the table using the database as the queue: it
+# leases a batch of due messages, runs the handler registered for each topic and
+# deletes the ones that succeed. Failures are retried with exponential backoff up
+# to OUTBOX_MAX_ATTEMPTS, then kept as dead. A worker that dies mid-batch loses its
+# lease and the messages run again, so delivery is at least once and handlers must
+# be idempotent.
+
+import json
+import random
+from datetime import datetime, timedelta
+
+from config import db
+from models import OutboxMessage
+from sqlalchemy import delete, func, insert, or_, select, update
+
+# topic -> function taking the decoded payload
+HANDLERS = {}
+
+
+def handler(topic):
+    """
+    Registers the decorated function as the handler for a topic.
+
+    Args:
+    topic (str): The topic, e.g. "order.created".
+    """
+
+    def decorator(function):
+        HANDLERS[topic] = function
+        return function
+
+    return decorator
+
+
+def enqueue(topic, payload):
+    """
+    Adds a message to the current transaction. It is delivered only if that
+    transaction commits.
+
+    Args:
+    topic (str): Selects the handler.
+    payload (dict): JSON serializable data for the handler.
+    """
+    db.session.add(
+        OutboxMessage(
+            topic=topic, payload=json.dumps(payload), available_at=datetime.utcnow()
+        )
+    )
+
+
+def enqueue_many(topic, payloads):
+    """The same as enqueue for many messages, written with a single INSERT."""
+    now = datetime.utcnow()
+    rows = [
+        {"topic": topic, "payload": json.dumps(payload), "available_at": now}
+        for payload in payloads
+    ]
+    if rows:
+        db.session.execute(insert(OutboxMessage.__table__), rows)
+
+
+def claim_batch(batch_size, lease_seconds, max_attempts):
+    """
+    Leases up to batch_size due messages to this worker and commits.
+
+    Returns:
+    list: (id, topic, payload, attempts) tuples in queue order, attempts
+    counting this one.
+    """
+    now = datetime.utcnow()
+    unleased = or_(
+        OutboxMessage.locked_until.is_(None), OutboxMessage.locked_until < now
+    )
+    # A worker that died on its last attempt never recorded the failure
+    db.session.execute(
+        update(OutboxMessage)
+        .where(
+            OutboxMessage.status == "pending",
+            OutboxMessage.attempts >= max_attempts,
+            unleased,
+        )
+        .values(status="dead", locked_until=None, last_error="Lease expired")
+        .execution_options(synchronize_session=False)
+    )
+    ids = db.session.scalars(
+        select(OutboxMessage.id)
+        .where(
+            OutboxMessage.status == "pending",
+            OutboxMessage.available_at <= now,
+            unleased,
+        )
+        .order_by(OutboxMessage.available_at, OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not ids:
+        db.session.commit()
+        return []
+    # The lease is checked again, so of two workers that picked the same rows on a
+    # database without SKIP LOCKED only the first to update gets them
+    rows = db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(ids), unleased)
+        .values(
+            locked_until=now + timedelta(seconds=lease_seconds),
+            attempts=OutboxMessage.attempts + 1,
+        )
+        .returning(
+            OutboxMessage.id,
+            OutboxMessage.topic,
+            OutboxMessage.payload,
+            OutboxMessage.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return sorted((tuple(row) for row in rows), key=lambda row: ids.index(row[0]))
+
+
+def retry_delay(attempts, base_seconds, max_seconds):
+    """
+    Exponential backoff with jitter: about base_seconds after the first failure,
+    doubling each time up to max_seconds. The jitter spreads out retries of
+    messages that failed together.
+    """
+    delay = min(max_seconds, base_seconds * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def process_batch(config):
+    """
+    Claims one batch and runs its messages. Each handler's own database work is
+    committed before the message counts as done, and the done messages are then
+    deleted together.
+
+    Args:
+    config: The app config, for the OUTBOX_* settings.
+
+    Returns:
+    tuple: (succeeded, failed) message counts.
+    """
+    messages = claim_batch(
+        config["OUTBOX_BATCH_SIZE"],
+        config["OUTBOX_LEASE_SECONDS"],
+        config["OUTBOX_MAX_ATTEMPTS"],
+    )
+    done = []
+    failed = 0
+    for id, topic, payload, attempts in messages:
+        try:
+            if topic not in HANDLERS:
+                raise LookupError(f"No handler for topic {topic!r}.")
+            HANDLERS[topic](json.loads(payload))
+            db.session.commit()
+            done.append(id)
+        except Exception as error:
+            db.session.rollback()
+            record_failure(id, attempts, f"{type(error).__name__}: {error}", config)
+            failed += 1
+    if done:
+        db.session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(done)))
+        db.session.commit()
+    return len(done), failed
+
+
+# Releases a failed message for a later retry, or marks it dead on its last attempt
+def record_failure(id, attempts, error, config):
+    if attempts >= config["OUTBOX_MAX_ATTEMPTS"]:
+        values = {"status": "dead"}
+    else:
+        delay = retry_delay(
+            attempts,
+            config["OUTBOX_RETRY_BASE_SECONDS"],
+            config["OUTBOX_RETRY_MAX_SECONDS"],
+        )
+        values = {"available_at": datetime.utcnow() + timedelta(seconds=delay)}
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id == id)
+        .values(locked_until=None, last_error=error, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def outbox_stats():
+    """Counts the messages per status, e.g. {"pending": 3, "dead": 1}."""
+    return dict(
+        db.session.execute(
+            select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+        ).all()
+    )
@@ -0,0 +1,216 @@
+# ratelimit.py
+# Token-bucket rate limiting for expensive endpoints such as the bcrypt-checked
+# credential routes. Each rule keeps one bucket per client IP and one per
+# username, so both a burst from one address and a spray across addresses at one
+# account are throttled. Over-limit requests get a 429 with Retry-After before the
+# resource method runs, so they cost no database or bcrypt work.
+
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate):
+    """
+    Parses a rate such as "10/minute" into a bucket size and refill rate.
+
+    Args:
+    rate (str): "<count>/<second|minute|hour|day>".
+
+    Returns:
+    tuple: (capacity, tokens per second).
+
+    Raises:
+    ValueError: If the rate is malformed.
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(second|minute|hour|day)\s*", rate or "")
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"Invalid rate limit {rate!r}; expected e.g. '10/minute'.")
+    count = int(match.group(1))
+    return count, count / PERIODS[match.group(2)]
+
+
+# In-process bucket store. Buckets are kept in LRU order and the least recently
+# used is dropped past max_entries; an idle bucket has refilled by then anyway.
+class MemoryBucketStore:
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def size(self):
+        return len(self._buckets)
+
+
+# Shared Redis store so every worker process draws from the same buckets. The
+# refill and take run as one script on the Redis clock, so workers never race or
+# disagree about time. Requires the optional redis package.
+class RedisBucketStore:
+    TAKE_SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate))
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required for a redis:// store.")
+        self.client = redis.Redis.from_url(url)
+        self._take = self.client.register_script(self.TAKE_SCRIPT)
+
+    def take(self, key, capacity, rate):
+        return float(self._take(keys=[f"ratelimit:{key}"], args=[capacity, rate]))
+
+    def size(self):
+        return None
+
+
+# Identifies the caller for a bucket. Each returns None when it cannot, and that
+# bucket is then skipped.
+def client_ip():
+    return request.remote_addr
+
+
+def json_username():
+    data = request.get_json(silent=True)
+    username = data.get("username") if isinstance(data, dict) else None
+    return username.strip().lower() if isinstance(username, str) else None
+
+
+KEY_FUNCTIONS = {"ip": client_ip, "username": json_username}
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.enabled = True
+        self.store = None
+        self.rates = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RATE_LIMIT_ENABLED", True)
+        app.config.setdefault("RATE_LIMIT_STORAGE_URL", None)
+        app.config.setdefault("RATE_LIMIT_LOGIN_IP", "20/minute")
+        app.config.setdefault("RATE_LIMIT_LOGIN_USERNAME", "5/minute")
+
+        self.enabled = app.config["RATE_LIMIT_ENABLED"]
+        url = app.config["RATE_LIMIT_STORAGE_URL"]
+        self.store = RedisBucketStore(url) if url else MemoryBucketStore()
+        # Every RATE_LIMIT_<RULE>_<KEY> setting, e.g. ("login", "ip") -> "20/minute"
+        self.rates = {}
+        for name, value in app.config.items():
+            match = re.fullmatch(r"RATE_LIMIT_([A-Z]+)_([A-Z]+)", name)
+            if match and match.group(2).lower() in KEY_FUNCTIONS:
+                rule = (match.group(1).lower(), match.group(2).lower())
+                self.rates[rule] = parse_rate(value)
+
+    def limit(self, rule):
+        """
+        Decorates a resource method with the buckets configured for rule.
+
+        Args:
+        rule (str): The rule name, e.g. "login" for the RATE_LIMIT_LOGIN_* settings.
+        Methods sharing a rule share its buckets.
+
+        Returns:
+        A decorator for use in a Resource's method_decorators.
+        """
+
+        def decorator(method):
+            @wraps(method)
+            def wrapper(*args, **kwargs):
+                retry_after = self.check(rule) if self.enabled else 0
+                if retry_after:
+                    response = make_response(
+                        {"error": "Too many attempts. Try again later."}, 429
+                    )
+                    response.headers["Retry-After"] = str(math.ceil(retry_after))
+                    return response
+                return method(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def check(self, rule):
+        """
+        Takes a token from each of the rule's buckets for the current request.
+
+        Returns:
+        float: 0 if the request may proceed, else seconds until it may retry.
+        """
+        retry_after = 0
+        for (rule_name, key_name), (capacity, rate) in self.rates.items():
+            if rule_name != rule:
+                continue
+            key = KEY_FUNCTIONS[key_name]()
+            if key is None:
+                continue
+            wait = self.store.take(f"{rule}:{key_name}:{key}", capacity, rate)
+            self._count(rule, key_name, "limited" if wait else "allowed")
+            retry_after = max(retry_after, wait)
+        return retry_after
+
+    def render_metrics(self):
+        lines = [
+            "# HELP rate_limit_checks_total Bucket checks by rule, key and result.",
+            "# TYPE rate_limit_checks_total counter",
+        ]
+        with self._lock:
+            for (rule, key, result), count in sorted(self.counts.items()):
+                lines.append(
+                    f'rate_limit_checks_total{{rule="{rule}",key="{key}",'
+                    f'result="{result}"}} {count}'
+                )
+        size = self.store.size()
+        if size is not None:
+            lines.append("# TYPE rate_limit_buckets gauge")
+            lines.append(f"rate_limit_buckets {size}")
+        return lines
+
+    def _count(self, rule, key, result):
+        with self._lock:
+            self.counts[(rule, key, result)] = (
+                self.counts.get((rule, key, result), 0) + 1
+            )
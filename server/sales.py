@@ -0,0 +1,129 @@
+# sales.py
+# Incremental maintenance of the daily sales aggregates and the report queries that
+# read them. Writers call record_sales inside the transaction that creates the
+# orders, so the aggregates commit or roll back together with them.
+
+from collections import defaultdict
+
+from config import db
+from models import DailyCategorySales, DailyProductSales, ProductCategory
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+REPORT_GROUPS = {
+    "day": (DailyProductSales, DailyProductSales.day),
+    "product": (DailyProductSales, DailyProductSales.product_id),
+    "category": (DailyCategorySales, DailyCategorySales.category_id),
+}
+
+
+def record_sales(lines):
+    """
+    Adds sold lines to the daily product and category aggregates.
+
+    Args:
+    lines: Iterable of (day, product_id, quantity, line_total) tuples, with
+    line_total in cents.
+    """
+    by_product = defaultdict(lambda: [0, 0])
+    for day, product_id, quantity, line_total in lines:
+        totals = by_product[(day, product_id)]
+        totals[0] += quantity
+        totals[1] += line_total
+    if not by_product:
+        return
+
+    product_ids = {product_id for _, product_id in by_product}
+    categories = defaultdict(list)
+    for product_id, category_id in db.session.execute(
+        select(ProductCategory.product_id, ProductCategory.category_id).where(
+            ProductCategory.product_id.in_(product_ids)
+        )
+    ):
+        categories[product_id].append(category_id)
+
+    by_category = defaultdict(lambda: [0, 0])
+    for (day, product_id), (units, revenue) in by_product.items():
+        for category_id in categories[product_id]:
+            totals = by_category[(day, category_id)]
+            totals[0] += units
+            totals[1] += revenue
+
+    increment(
+        DailyProductSales,
+        "product_id",
+        [
+            {"day": day, "product_id": key, "units": units, "revenue": revenue}
+            for (day, key), (units, revenue) in by_product.items()
+        ],
+    )
+    increment(
+        DailyCategorySales,
+        "category_id",
+        [
+            {"day": day, "category_id": key, "units": units, "revenue": revenue}
+            for (day, key), (units, revenue) in by_category.items()
+        ],
+    )
+
+
+# Upserts rows, adding units and revenue to any existing row for the same key.
+# Uses INSERT ... ON CONFLICT DO UPDATE, which SQLite and PostgreSQL both support.
+def increment(model, key_column, rows):
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    table = model.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=["day", key_column],
+        set_={
+            "units": table.c.units + statement.excluded.units,
+            "revenue": table.c.revenue + statement.excluded.revenue,
+        },
+    )
+    db.session.execute(statement, rows)
+
+
+def sales_report(start, end, group_by):
+    """
+    Sums the aggregates between two dates, inclusive. The cost depends on the
+    number of days and products in the range, not on the number of orders.
+
+    Args:
+    start (date): First day of the range.
+    end (date): Last day of the range.
+    group_by (str): "day", "product" or "category".
+
+    Returns:
+    dict: Overall units and revenue, plus one row per group. Revenue is in dollars.
+    """
+    model, key = REPORT_GROUPS[group_by]
+    rows = db.session.execute(
+        select(key, func.sum(model.units), func.sum(model.revenue))
+        .where(model.day.between(start, end))
+        .group_by(key)
+        .order_by(key)
+    )
+    units, revenue = db.session.execute(
+        select(
+            func.coalesce(func.sum(DailyProductSales.units), 0),
+            func.coalesce(func.sum(DailyProductSales.revenue), 0),
+        ).where(DailyProductSales.day.between(start, end))
+    ).one()
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "group_by": group_by,
+        "units": units,
+        "revenue": revenue / 100,
+        "rows": [
+            {
+                key.key: value.isoformat() if group_by == "day" else value,
+                "units": group_units,
+                "revenue": group_revenue / 100,
+            }
+            for value, group_units, group_revenue in rows
+        ],
+    }
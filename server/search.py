@@ -0,0 +1,261 @@
+# search.py
+# Full-text product search. Products are indexed by name, description, imageAlt and
+# category names in an inverted index: an FTS5 virtual table on SQLite, or a
+# tsvector column with a GIN index on PostgreSQL. Model events keep the index in
+# step with the products inside the same transaction; rebuild_search_index
+# repopulates it after writes that bypass the ORM, such as seed.py's bulk mode.
+
+import re
+
+import click
+from config import db
+from flask.cli import with_appcontext
+from models import Category, Product, ProductCategory
+from sqlalchemy import (
+    DDL,
+    bindparam,
+    column,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    literal_column,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.orm import Session, object_session
+
+# Product attributes that feed the index; other updates (stock, price) skip it
+SEARCHED_ATTRIBUTES = ("name", "description", "imageAlt")
+REINDEX_KEY = "search_reindex"
+
+# bm25 weights in the FTS5 column order: name, description, image_alt, categories
+SQLITE_WEIGHTS = (10.0, 1.0, 2.0, 5.0)
+
+sqlite_index = table(
+    "product_search",
+    column("rowid"),
+    column("name"),
+    column("description"),
+    column("image_alt"),
+    column("categories"),
+)
+postgres_index = table("product_search", column("product_id"), column("document"))
+
+CREATE_INDEX = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE product_search USING fts5("
+        "name, description, image_alt, categories, "
+        "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+    ],
+    "postgresql": [
+        "CREATE TABLE product_search ("
+        "product_id INTEGER PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE, "
+        "document TSVECTOR NOT NULL)",
+        "CREATE INDEX ix_product_search_document ON product_search "
+        "USING GIN (document)",
+    ],
+}
+
+# db.create_all() and drop_all() manage the index along with the products table
+for dialect, statements in CREATE_INDEX.items():
+    for statement in statements:
+        event.listen(
+            Product.__table__,
+            "after_create",
+            DDL(statement).execute_if(dialect=dialect),
+        )
+    event.listen(
+        Product.__table__,
+        "before_drop",
+        DDL("DROP TABLE IF EXISTS product_search").execute_if(dialect=dialect),
+    )
+
+
+def search_products(q, limit, offset=0):
+    """
+    Finds products matching every word of q, best match first. The last word also
+    matches as a prefix, so partial input finds results while typing.
+
+    Args:
+    q (str): The search text.
+    limit (int): Maximum number of products to return.
+    offset (int): Number of ranked results to skip.
+
+    Returns:
+    list: Product dicts with prices in dollars.
+
+    Raises:
+    ValueError: If q contains no searchable words.
+    """
+    terms = re.findall(r"\w+", q.lower())
+    if not terms:
+        raise ValueError("The q parameter must contain a search term.")
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        query = func.to_tsquery("english", " & ".join(terms) + ":*")
+        ranked = (
+            select(postgres_index.c.product_id)
+            .where(postgres_index.c.document.bool_op("@@")(query))
+            .order_by(func.ts_rank(postgres_index.c.document, query).desc())
+        )
+    else:
+        # Terms are quoted so FTS5 operators in the input are matched as words
+        query = " ".join(f'"{term}"' for term in terms) + "*"
+        index = literal_column("product_search")
+        ranked = (
+            select(sqlite_index.c.rowid)
+            .where(index.op("MATCH")(bindparam("query", query)))
+            .order_by(func.bm25(index, *SQLITE_WEIGHTS))
+        )
+    ids = db.session.scalars(ranked.limit(limit).offset(offset)).all()
+
+    products = {
+        product.id: product
+        for product in db.session.scalars(select(Product).where(Product.id.in_(ids)))
+    }
+    return [
+        products[id].to_dict(convert_price_to_dollars=True)
+        for id in ids
+        if id in products
+    ]
+
+
+def reindex_products(connection, product_ids=None):
+    """
+    Replaces the index entries of the given products with their current data.
+    Deleted products simply drop out.
+
+    Args:
+    connection: The connection (and so the transaction) to write through.
+    product_ids (iterable): Products to reindex, or None for all of them.
+    """
+    postgres = connection.dialect.name == "postgresql"
+    index = postgres_index if postgres else sqlite_index
+    key = index.c.product_id if postgres else index.c.rowid
+
+    clear = delete(index)
+    source = select(
+        Product.id,
+        Product.name,
+        func.coalesce(Product.description, ""),
+        func.coalesce(Product.imageAlt, ""),
+        func.coalesce(category_names(postgres), ""),
+    )
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        clear = clear.where(key.in_(product_ids))
+        source = source.where(Product.id.in_(product_ids))
+    connection.execute(clear)
+
+    if postgres:
+        id, name, description, image_alt, categories = source.subquery().c
+        document = (
+            weighted(name, "A")
+            .op("||")(weighted(categories, "B"))
+            .op("||")(weighted(image_alt, "C"))
+            .op("||")(weighted(description, "D"))
+        )
+        connection.execute(
+            insert(index).from_select(["product_id", "document"], select(id, document))
+        )
+    else:
+        connection.execute(
+            insert(index).from_select(
+                ["rowid", "name", "description", "image_alt", "categories"], source
+            )
+        )
+
+
+def rebuild_search_index():
+    """Repopulates the whole search index from the products table and commits."""
+    connection = db.session.connection()
+    reindex_products(connection)
+    if connection.dialect.name == "sqlite":
+        # Merges the index b-trees written by the rebuild into one
+        connection.execute(
+            text("INSERT INTO product_search (product_search) VALUES ('optimize')")
+        )
+    db.session.commit()
+
+
+# Space-separated category names of the outer product, as a correlated subquery
+def category_names(postgres):
+    aggregate = func.string_agg if postgres else func.group_concat
+    return (
+        select(aggregate(Category.name, " "))
+        .join(ProductCategory, ProductCategory.category_id == Category.id)
+        .where(ProductCategory.product_id == Product.id)
+        .scalar_subquery()
+    )
+
+
+# The weight is inlined: setweight takes a "char", which a varchar bind will not cast to
+def weighted(value, weight):
+    return func.setweight(
+        func.to_tsvector("english", value), literal_column(f"'{weight}'")
+    )
+
+
+# Model events only note which products changed; the index is rewritten once per
+# flush, after the product_categories rows of new products exist.
+def mark_for_reindex(target, product_ids):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(REINDEX_KEY, set()).update(product_ids)
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_delete")
+def product_written(mapper, connection, target):
+    mark_for_reindex(target, [target.id])
+
+
+@event.listens_for(Product, "after_update")
+def product_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[key].history.has_changes() for key in SEARCHED_ATTRIBUTES):
+        mark_for_reindex(target, [target.id])
+
+
+@event.listens_for(ProductCategory, "after_insert")
+@event.listens_for(ProductCategory, "after_delete")
+def product_category_written(mapper, connection, target):
+    mark_for_reindex(target, [target.product_id])
+
+
+# Moving a link to another product changes both the old and the new product
+@event.listens_for(ProductCategory, "after_update")
+def product_category_updated(mapper, connection, target):
+    history = inspect(target).attrs.product_id.history
+    mark_for_reindex(target, [target.product_id, *history.deleted])
+
+
+@event.listens_for(Category, "after_update")
+def category_updated(mapper, connection, target):
+    if inspect(target).attrs.name.history.has_changes():
+        mark_for_reindex(
+            target,
+            connection.scalars(
+                select(ProductCategory.product_id).where(
+                    ProductCategory.category_id == target.id
+                )
+            ),
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def reindex_flushed_products(session, flush_context):
+    product_ids = session.info.pop(REINDEX_KEY, None)
+    if product_ids:
+        reindex_products(session.connection(), product_ids)
+
+
+@click.command("rebuild-search-index")
+@with_appcontext
+def rebuild_search_index_command():
+    """Rebuild the product search index."""
+    rebuild_search_index()
+    print("Search index rebuilt.")
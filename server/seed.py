@@ -1,17 +1,29 @@
 #!/usr/bin/env python3
 # seed.py
 # Standard library imports
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
 from random import choice as rc
 from random import randint
 
 from app import commit_session, get_or_create_category
-from config import app, db
+from config import create_app, db, password_hasher
+from facets import rebuild_category_facets
 from faker import Faker
-from flask_bcrypt import Bcrypt
 from helpers import dollar_to_cents
 from models import Order, OrderDetail, Product, ProductCategory, User
+from sales import record_sales
+from search import rebuild_search_index
+from sqlalchemy import insert, select
 from sqlalchemy.exc import IntegrityError, NoResultFound
 
+# Every user created by the bulk mode logs in as seed.user<n> with this password
+SEED_PASSWORD = "seed-password"
+# Bulk orders fall in the year before this date unless --until moves it
+SEED_UNTIL = "2026-01-01"
+
 products_data = [
     {
         "name": "Alpine Elegance",
@@ -70,12 +82,12 @@ products_data = [
 ]
 
 fake = Faker()
-bcrypt = Bcrypt(app)
 
 
 def create_fake_orders(num_orders=5):
+    user_ids = db.session.scalars(select(User.id)).all()
     for _ in range(num_orders):
-        user_id = rc(User.query.all()).id
+        user_id = rc(user_ids)
         order = Order(user_id=user_id)
         db.session.add(order)
 
@@ -92,15 +104,24 @@ def create_fake_order_details(num_details=10):
         print("No products available to create order details.")
         return
 
+    orders = Order.query.all()
     for _ in range(num_details):
-        order_id = rc(Order.query.all()).id
-        product_id = rc(products).id
+        order = rc(orders)
+        product = rc(products)
         quantity = randint(1, 5)
 
         order_detail = OrderDetail(
-            order_id=order_id, product_id=product_id, quantity=quantity
+            order_id=order.id,
+            product_id=product.id,
+            quantity=quantity,
+            unit_price=product.price,
+            line_total=product.price * quantity,
         )
+        order.total += order_detail.line_total
         db.session.add(order_detail)
+        record_sales(
+            [(order.created_at.date(), product.id, quantity, order_detail.line_total)]
+        )
 
     try:
         db.session.commit()
@@ -132,7 +153,7 @@ def create_fake_users(num_users=2):
                 shipping_city=fake.city(),
                 shipping_state=fake.state(),
                 shipping_zip=fake.zipcode(),
-                password=bcrypt.generate_password_hash(fake.password()).decode("utf-8"),
+                password=fake.password(),
             )
 
             db.session.add(user)
@@ -187,11 +208,240 @@ def create_fake_products():
         print(f"Failed to add products. Error: {error}")
 
 
+# Bulk mode
+# Generates rows in batches and writes them with executemany-style inserts, one
+# transaction per table. Foreign key ids are loaded once up front instead of per row.
+
+
+def bulk_insert(model, rows, batch_size, returning=False):
+    ids = []
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        if returning:
+            ids.extend(
+                db.session.scalars(
+                    insert(model).returning(model.id, sort_by_parameter_order=True),
+                    batch,
+                )
+            )
+        else:
+            db.session.execute(insert(model), batch)
+    db.session.commit()
+    print(f"Added {len(rows)} rows to {model.__tablename__}.")
+    return ids
+
+
+def bulk_create_users(num_users, rng, batch_size, hash_each=False):
+    # Numbered from 1 so the same arguments always make the same users
+    if db.session.scalar(select(User.id).where(User.username.like("seed.user%"))):
+        raise ValueError("The database already has bulk seeded users.")
+    # One shared hash unless asked for a distinct salt per user, which is spread
+    # over the hashing process pool
+    if hash_each:
+        hashes = password_hasher.generate_password_hashes(SEED_PASSWORD, num_users)
+    else:
+        hashes = [password_hasher.generate_password_hash(SEED_PASSWORD)] * num_users
+
+    rows = []
+    for i, password_hash in zip(range(1, num_users + 1), hashes):
+        rows.append(
+            {
+                "username": f"seed.user{i}",
+                "email": f"seed.user{i}@example.com",
+                "first_name": fake.first_name(),
+                "last_name": fake.last_name(),
+                "_password_hash": password_hash,
+                "shipping_address": fake.street_address(),
+                "shipping_city": fake.city(),
+                "shipping_state": fake.state(),
+                "shipping_zip": fake.zipcode(),
+            }
+        )
+    return bulk_insert(User, rows, batch_size, returning=True)
+
+
+def bulk_create_products(num_products, rng, batch_size):
+    category_ids = [get_or_create_category(name).id for name in ("Genesis", "Elite")]
+    rows = [
+        {
+            "name": f"{fake.word().title()} {fake.word().title()}",
+            "description": fake.text(),
+            "price": rng.randint(30000, 150000) * 100,
+            "item_quantity": rng.randint(0, 50),
+            "image_url": f"/{rng.choice(products_data)['imageSrc']}",
+            "imageAlt": fake.sentence(),
+        }
+        for _ in range(num_products)
+    ]
+    product_ids = bulk_insert(Product, rows, batch_size, returning=True)
+    bulk_insert(
+        ProductCategory,
+        [
+            {"product_id": product_id, "category_id": category_id}
+            for product_id in product_ids
+            for category_id in rng.sample(category_ids, rng.randint(1, 2))
+        ],
+        batch_size,
+    )
+    return {product_id: row["price"] for product_id, row in zip(product_ids, rows)}
+
+
+# Orders only go to the users and products this run created, so rows that were
+# already in the database do not change what is generated
+def bulk_create_orders(
+    num_orders, max_details, rng, batch_size, user_ids, prices, until
+):
+    product_ids = list(prices)
+    if not user_ids or not product_ids:
+        print("Users and products are needed before orders can be added.")
+        return
+
+    # Spread orders over a year so date-range queries have data to chew on
+    for start in range(0, num_orders, batch_size):
+        orders = []
+        for _ in range(min(batch_size, num_orders - start)):
+            lines = []
+            for _ in range(rng.randint(1, max_details)):
+                product_id = rng.choice(product_ids)
+                quantity = rng.randint(1, 5)
+                lines.append(
+                    {
+                        "product_id": product_id,
+                        "quantity": quantity,
+                        "unit_price": prices[product_id],
+                        "line_total": prices[product_id] * quantity,
+                    }
+                )
+            created_at = until - timedelta(seconds=rng.randint(1, 365 * 86400))
+            orders.append((created_at, lines))
+
+        order_ids = db.session.scalars(
+            insert(Order).returning(Order.id, sort_by_parameter_order=True),
+            [
+                {
+                    "user_id": rng.choice(user_ids),
+                    "created_at": created_at,
+                    "total": sum(line["line_total"] for line in lines),
+                }
+                for created_at, lines in orders
+            ],
+        ).all()
+        db.session.execute(
+            insert(OrderDetail),
+            [
+                {"order_id": order_id, **line}
+                for order_id, (_, lines) in zip(order_ids, orders)
+                for line in lines
+            ],
+        )
+        record_sales(
+            (
+                created_at.date(),
+                line["product_id"],
+                line["quantity"],
+                line["line_total"],
+            )
+            for created_at, lines in orders
+            for line in lines
+        )
+    db.session.commit()
+    print(f"Added {num_orders} orders with up to {max_details} details each.")
+
+
+def bulk_seed(
+    users,
+    products,
+    orders,
+    details_per_order=3,
+    seed=42,
+    batch_size=10000,
+    hash_each=False,
+    until=SEED_UNTIL,
+):
+    """
+    Seeds a large synthetic dataset. The same arguments always produce the same
+    data, apart from the random bcrypt salts, whatever else is in the database.
+
+    Args:
+    users (int): Users to add. They log in as seed.user<n> with SEED_PASSWORD.
+    products (int): Products to add, each in one or both categories.
+    orders (int): Orders to add, spread over the new users and products and over
+    the year before until.
+    details_per_order (int): Maximum line items per order.
+    seed (int): Seed for Faker and the random generator.
+    batch_size (int): Rows per insert statement.
+    hash_each (bool): Hash the password per user in the process pool instead of once.
+    until (str): ISO date the orders end before.
+
+    Raises:
+    ValueError: If the database already has bulk seeded users.
+    """
+    rng = random.Random(seed)
+    Faker.seed(seed)
+    started = time.perf_counter()
+    user_ids = bulk_create_users(users, rng, batch_size, hash_each)
+    prices = bulk_create_products(products, rng, batch_size)
+    # The bulk inserts bypass the model events that maintain the search index and
+    # the category facets
+    rebuild_search_index()
+    rebuild_category_facets()
+    bulk_create_orders(
+        orders,
+        details_per_order,
+        rng,
+        batch_size,
+        user_ids,
+        prices,
+        datetime.fromisoformat(until),
+    )
+    print(f"Bulk seeding finished in {time.perf_counter() - started:.1f}s.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the Mont Luxe database")
+    parser.add_argument(
+        "--bulk", action="store_true", help="generate a large synthetic dataset"
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--details-per-order", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument(
+        "--until",
+        default=SEED_UNTIL,
+        help="ISO date the generated year of orders ends before",
+    )
+    parser.add_argument(
+        "--hash-each",
+        action="store_true",
+        help="hash a password per user in the process pool instead of sharing one",
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    with app.app_context():
+    args = parse_args()
+    with create_app().app_context():
         db.create_all()
-        create_fake_users()
-        create_fake_orders()
-        create_fake_products()
-        create_fake_order_details()
+        if args.bulk:
+            try:
+                bulk_seed(
+                    args.users,
+                    args.products,
+                    args.orders,
+                    args.details_per_order,
+                    args.seed,
+                    args.batch_size,
+                    args.hash_each,
+                    args.until,
+                )
+            except ValueError as error:
+                raise SystemExit(f"{error} Bulk seed an empty database.")
+        else:
+            create_fake_users()
+            create_fake_orders()
+            create_fake_products()
+            create_fake_order_details()
         print("Database seeded successfully!")
@@ -0,0 +1,241 @@
+# serializers.py
+# Fast path for the read-only list endpoints. Each serializer is built once from a
+# fixed list of columns, selects those columns as plain tuples (no ORM objects,
+# identity map or attribute instrumentation) and zips them into dicts with the
+# same shape as the model's to_dict(). Payloads are encoded with orjson when it is
+# installed and the standard library json module otherwise.
+
+import json
+from collections import defaultdict
+
+from config import db
+from helpers import format_datetime
+from models import Order, OrderDetail, Product, ProductCategory, User
+from sqlalchemy import select
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(payload):
+    """
+    Encodes a payload as compact JSON.
+
+    Args:
+    payload: Any JSON serializable value.
+
+    Returns:
+    bytes: The UTF-8 encoded JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+# Serializes the rows of one model. transforms maps a key to a function applied to
+# that value, for values JSON cannot represent directly.
+class RowSerializer:
+    def __init__(self, model, columns, transforms=None):
+        self.model = model
+        self.columns = tuple(columns)
+        self.keys = tuple(column.key for column in self.columns)
+        self.transform_functions = transforms or {}
+        self.transforms = [
+            (self.keys.index(key), function)
+            for key, function in self.transform_functions.items()
+            if key in self.keys
+        ]
+
+    @property
+    def fields(self):
+        return self.keys
+
+    def only(self, fields):
+        """
+        Returns a serializer for a subset of the fields, selecting only their
+        columns. The id is always kept, since clients and batching key on it.
+
+        Args:
+        fields (iterable): Field names, all of them in self.fields.
+        """
+        fields = set(fields) | {"id"}
+        return RowSerializer(
+            self.model,
+            [column for column in self.columns if column.key in fields],
+            self.transform_functions,
+        )
+
+    def statement(self):
+        return select(*self.columns).order_by(self.model.id)
+
+    def load(self, *criteria, limit=None, order_by=None):
+        """
+        Loads and serializes the rows matching criteria, in id order unless
+        order_by says otherwise.
+
+        Args:
+        criteria: SQLAlchemy filter expressions.
+        limit (int): Maximum number of rows, or None for all of them.
+        order_by (tuple): Order by expressions replacing the id order.
+
+        Returns:
+        list: One dict per row.
+        """
+        statement = self.statement().where(*criteria).limit(limit)
+        if order_by is not None:
+            statement = statement.order_by(None).order_by(*order_by)
+        return self.to_dicts(db.session.execute(statement))
+
+    def batches(self, batch_size):
+        """
+        Yields every row in id order, batch_size rows at a time. Each batch is its
+        own keyset query, so memory stays flat however large the table is.
+        """
+        last_id = 0
+        while True:
+            batch = self.load(self.model.id > last_id, limit=batch_size)
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1]["id"]
+
+    def to_dicts(self, rows):
+        keys = self.keys
+        if not self.transforms:
+            return [dict(zip(keys, row)) for row in rows]
+        dicts = []
+        for row in rows:
+            row = list(row)
+            for index, function in self.transforms:
+                if row[index] is not None:
+                    row[index] = function(row[index])
+            dicts.append(dict(zip(keys, row)))
+        return dicts
+
+
+# Orders nest their user and line items, like Order.to_dict(). The user comes from
+# an outer join in the same query; the line items from one more query per load.
+class OrderSerializer(RowSerializer):
+    COLUMNS = (Order.id, Order.user_id, Order.created_at, Order.total)
+
+    # Either nested serializer may be None to leave that key out
+    def __init__(self, user_serializer, detail_serializer, columns=COLUMNS):
+        super().__init__(Order, columns, {"created_at": format_datetime})
+        self.user_serializer = user_serializer
+        self.detail_serializer = detail_serializer
+
+    @property
+    def fields(self):
+        return tuple(column.key for column in self.COLUMNS) + ("user", "order_details")
+
+    def only(self, fields):
+        fields = set(fields) | {"id"}
+        return OrderSerializer(
+            self.user_serializer if "user" in fields else None,
+            self.detail_serializer if "order_details" in fields else None,
+            [column for column in self.COLUMNS if column.key in fields],
+        )
+
+    def statement(self):
+        if self.user_serializer is None:
+            return super().statement()
+        return (
+            select(*self.columns, *self.user_serializer.columns)
+            .outerjoin(User, User.id == Order.user_id)
+            .order_by(Order.id)
+        )
+
+    def load(self, *criteria, limit=None):
+        orders = super().load(*criteria, limit=limit)
+        if self.detail_serializer is None:
+            return orders
+        if criteria or limit is not None:
+            criteria = (OrderDetail.order_id.in_([order["id"] for order in orders]),)
+        details = defaultdict(list)
+        for detail in self.detail_serializer.load(*criteria):
+            details[detail["order_id"]].append(detail)
+        for order in orders:
+            order["order_details"] = details.get(order["id"], [])
+        return orders
+
+    def to_dicts(self, rows):
+        if self.user_serializer is None:
+            return super().to_dicts(rows)
+        rows = list(rows)
+        split = len(self.columns)
+        users = self.user_serializer.to_dicts(row[split:] for row in rows)
+        orders = super().to_dicts(row[:split] for row in rows)
+        for order, user in zip(orders, users):
+            order["user"] = user if user["id"] is not None else None
+        return orders
+
+
+user_serializer = RowSerializer(
+    User,
+    (
+        User.id,
+        User.username,
+        User.email,
+        User.first_name,
+        User.last_name,
+        User.shipping_address,
+        User.shipping_city,
+        User.shipping_state,
+        User.shipping_zip,
+    ),
+)
+order_detail_serializer = RowSerializer(
+    OrderDetail,
+    (
+        OrderDetail.id,
+        OrderDetail.order_id,
+        OrderDetail.product_id,
+        OrderDetail.quantity,
+        OrderDetail.unit_price,
+        OrderDetail.line_total,
+    ),
+)
+product_category_serializer = RowSerializer(
+    ProductCategory,
+    (ProductCategory.id, ProductCategory.product_id, ProductCategory.category_id),
+)
+order_serializer = OrderSerializer(user_serializer, order_detail_serializer)
+order_summary_serializer = RowSerializer(
+    Order, OrderSerializer.COLUMNS, {"created_at": format_datetime}
+)
+product_summary_serializer = RowSerializer(
+    Product, (Product.id, Product.name, Product.image_url, Product.imageAlt)
+)
+
+
+def add_line_items(orders):
+    """
+    Embeds each order's line items, each with a summary of its product. Takes two
+    queries however many orders and lines there are.
+
+    Args:
+    orders (list): Order dicts with an "id"; each gains an "order_details" list.
+
+    Returns:
+    list: The same orders.
+    """
+    if not orders:
+        return orders
+    details = order_detail_serializer.load(
+        OrderDetail.order_id.in_([order["id"] for order in orders])
+    )
+    products = {
+        product["id"]: product
+        for product in product_summary_serializer.load(
+            Product.id.in_({detail["product_id"] for detail in details})
+        )
+    }
+    by_order = defaultdict(list)
+    for detail in details:
+        detail["product"] = products.get(detail["product_id"])
+        by_order[detail["order_id"]].append(detail)
+    for order in orders:
+        order["order_details"] = by_order.get(order["id"], [])
+    return orders
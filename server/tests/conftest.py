@@ -0,0 +1,129 @@
+# conftest.py
+# Shared fixtures. Every test gets its own app on a fresh SQLite file, with the
+# schema created from the models, the cheapest bcrypt cost, inline hashing and no
+# rate limiting, plus factories for the rows most tests need.
+
+import os
+import sys
+
+import pytest
+from flask import g, request_finished
+
+# The server modules import each other by bare name, as they do when run from server/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import create_app, db  # noqa: E402
+from models import Order, OrderDetail, Product, User  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+            "CATALOG_CACHE_URL": None,
+            "RATE_LIMIT_STORAGE_URL": None,
+            "RATE_LIMIT_ENABLED": False,
+            "BCRYPT_LOG_ROUNDS": 4,
+            "PASSWORD_HASH_WORKERS": 0,
+        }
+    )
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def query_counts(app):
+    """
+    Collects the number of SQL statements each request ran, as counted for the
+    sql_queries_per_request metric.
+    """
+    counts = []
+
+    def record(sender, response, **extra):
+        counts.append(g.sql_queries)
+
+    request_finished.connect(record, app)
+    yield counts
+    request_finished.disconnect(record, app)
+
+
+@pytest.fixture
+def make_user(app):
+    def make(username="alice"):
+        with app.app_context():
+            user = User(
+                username=username,
+                email=f"{username}@example.com",
+                first_name="Test",
+                last_name="User",
+                shipping_address="1 Main St",
+                shipping_city="Springfield",
+                shipping_state="NY",
+                shipping_zip="10001",
+            )
+            user.password = "password"
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+    return make
+
+
+@pytest.fixture
+def make_product(app):
+    # price is in dollars, as the model's validator expects
+    def make(name="Watch", price=100, item_quantity=10):
+        with app.app_context():
+            product = Product(
+                name=name,
+                description="A watch",
+                price=price,
+                item_quantity=item_quantity,
+                image_url="img/watch.png",
+                imageAlt="A watch",
+            )
+            db.session.add(product)
+            db.session.commit()
+            return product.id
+
+    return make
+
+
+@pytest.fixture
+def make_orders(app):
+    """Adds count orders of user_id, each with one line of product_id."""
+
+    def make(user_id, product_id, count, created_at=None):
+        with app.app_context():
+            price = db.session.get(Product, product_id).price
+            orders = [
+                Order(user_id=user_id, created_at=created_at, total=price)
+                for _ in range(count)
+            ]
+            db.session.add_all(orders)
+            db.session.flush()
+            db.session.add_all(
+                OrderDetail(
+                    order_id=order.id,
+                    product_id=product_id,
+                    quantity=1,
+                    unit_price=price,
+                    line_total=price,
+                )
+                for order in orders
+            )
+            db.session.commit()
+            return [order.id for order in orders]
+
+    return make
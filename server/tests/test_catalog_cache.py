@@ -0,0 +1,93 @@
+# The catalog version behind the catalog cache and ETags must be shared by every
+# worker process, not counted per process.
+
+from cache import CatalogCache
+
+
+def test_etag_changes_after_a_catalog_write(client):
+    first = client.get("/categories")
+    assert client.post("/categories", json={"name": "Genesis"}).status_code == 201
+
+    second = client.get("/categories", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert [category["name"] for category in second.get_json()] == ["Genesis"]
+
+
+def test_unchanged_catalog_answers_304(client):
+    first = client.get("/categories")
+
+    second = client.get("/categories", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 304
+
+
+def test_workers_share_the_catalog_version(app):
+    # Two caches stand in for two forked workers, each with its own LRU
+    worker_a, worker_b = CatalogCache(app), CatalogCache(app)
+    with app.app_context():
+        version = worker_a.version
+    with app.app_context():
+        assert worker_b.version == version
+        worker_b.invalidate()
+    with app.app_context():
+        assert worker_a.version == version + 1
+        assert worker_a.get_or_load("categories", lambda: ["fresh"]) == ["fresh"]
+
+
+def test_json_and_ndjson_have_their_own_etags(client):
+    ndjson = {"Accept": "application/x-ndjson"}
+    as_json = client.get("/product_categories")
+    as_ndjson = client.get("/product_categories", headers=ndjson)
+
+    assert as_ndjson.mimetype == "application/x-ndjson"
+    assert as_json.headers["ETag"] != as_ndjson.headers["ETag"]
+    assert "Accept" in as_json.vary and "Accept" in as_ndjson.vary
+
+    # The JSON ETag must not validate an NDJSON request, nor the reverse
+    crossed = client.get(
+        "/product_categories",
+        headers={**ndjson, "If-None-Match": as_json.headers["ETag"]},
+    )
+    assert crossed.status_code == 200
+    crossed = client.get(
+        "/product_categories", headers={"If-None-Match": as_ndjson.headers["ETag"]}
+    )
+    assert crossed.status_code == 200
+
+    same = client.get(
+        "/product_categories",
+        headers={**ndjson, "If-None-Match": as_ndjson.headers["ETag"]},
+    )
+    assert same.status_code == 304
+    assert "Accept" in same.vary
+
+
+def test_orders_keep_unrelated_cache_entries_and_etags(client, make_user, make_product):
+    user_id = make_user()
+    watch = make_product(name="Watch", item_quantity=5)
+    make_product(name="Clock", item_quantity=5)
+    etags = {
+        path: client.get(path).headers["ETag"] for path in ("/products", "/categories")
+    }
+    assert client.get(f"/products/{watch}").get_json()["item_quantity"] == 5
+
+    order = {
+        "user_id": user_id,
+        "order_details": [{"product_id": watch, "quantity": 1}],
+    }
+    assert client.post("/orders", json=order).status_code == 201
+    assert client.post("/orders/bulk", json=[order]).get_json()["created"] == 1
+
+    # Stock is left, so listings and their ETags stay valid...
+    for path, etag in etags.items():
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+    # ...while the ordered product's own entry is reloaded
+    assert client.get(f"/products/{watch}").get_json()["item_quantity"] == 3
+
+    # Selling out changes in stock filters and facet counts, so that invalidates
+    order["order_details"][0]["quantity"] = 3
+    assert client.post("/orders", json=order).status_code == 201
+    response = client.get("/products", headers={"If-None-Match": etags["/products"]})
+    assert response.status_code == 200
@@ -0,0 +1,24 @@
+# A full hashing queue must turn callers away at once with a 503 instead of
+# holding their request threads until a slot frees up.
+
+import time
+
+import pytest
+from flask import Flask
+from hashing import PasswordHasher
+from werkzeug.exceptions import ServiceUnavailable
+
+
+def test_full_queue_answers_503_without_waiting():
+    app = Flask(__name__)
+    app.config.update(
+        BCRYPT_LOG_ROUNDS=4, PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_SIZE=0
+    )
+    hasher = PasswordHasher(app)
+    # Stands in for a hash already running in the only slot
+    hasher._slots.acquire()
+
+    started = time.perf_counter()
+    with pytest.raises(ServiceUnavailable):
+        hasher.generate_password_hash("password")
+    assert time.perf_counter() - started < 0.5
@@ -0,0 +1,19 @@
+# Statement timing must not leave state behind on pooled connections, including
+# for statements that raise and so never reach after_cursor_execute.
+
+from copy import deepcopy
+
+import pytest
+from config import db
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+def test_failed_statements_leave_no_timing_state(app):
+    with app.app_context(), db.engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        info = deepcopy(connection.info)
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM no_such_table"))
+        assert connection.info == info
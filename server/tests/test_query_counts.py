@@ -0,0 +1,50 @@
+# Guards against N+1 regressions: list endpoints must run a fixed number of SQL
+# statements however many rows they return.
+
+import pytest
+
+
+@pytest.fixture
+def shop(make_user, make_product):
+    return make_user(), make_product()
+
+
+@pytest.mark.parametrize("orders", [5, 50])
+def test_order_list_runs_two_queries(client, shop, make_orders, query_counts, orders):
+    user_id, product_id = shop
+    make_orders(user_id, product_id, orders)
+
+    response = client.get("/orders")
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == orders
+    # Orders joined to their users, then every line item in one SELECT ... IN
+    assert query_counts == [2]
+
+
+def test_order_detail_list_runs_one_query(client, shop, make_orders, query_counts):
+    user_id, product_id = shop
+    make_orders(user_id, product_id, 20)
+
+    response = client.get("/order_details")
+
+    assert len(response.get_json()) == 20
+    assert query_counts == [1]
+
+
+@pytest.mark.parametrize("products", [5, 50])
+def test_product_batch_runs_one_product_query(
+    client, make_product, query_counts, products
+):
+    ids = [make_product(name=f"Watch {i}") for i in range(products)]
+    path = "/products?ids=" + ",".join(map(str, ids))
+    # Creates the catalog version row, which is read once per request
+    client.get("/categories")
+
+    cold = client.get(path)
+    warm = client.get(path)
+
+    assert len(cold.get_json()["products"]) == products
+    assert warm.get_json() == cold.get_json()
+    # The version, then a single IN query for the misses; cached payloads are free
+    assert query_counts[1:] == [2, 1]
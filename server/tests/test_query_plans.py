@@ -0,0 +1,62 @@
+# The foreign key lookups behind orders, order details and category filters must
+# use an index rather than scan the table. Checked with SQLite's EXPLAIN QUERY PLAN.
+
+import pytest
+from config import db
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+
+def query_plan(app, sql, **params):
+    with app.app_context():
+        rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize(
+    "sql, index",
+    [
+        (
+            "SELECT * FROM orders WHERE user_id = :id",
+            "ix_orders_user_id_created_at",
+        ),
+        (
+            "SELECT * FROM order_details WHERE order_id = :id",
+            "ix_order_details_order_id",
+        ),
+        (
+            "SELECT * FROM order_details WHERE product_id = :id",
+            "ix_order_details_product_id",
+        ),
+        (
+            "SELECT * FROM product_categories WHERE category_id = :id",
+            "ix_product_categories_category_id",
+        ),
+        (
+            "SELECT * FROM product_categories WHERE product_id = :id",
+            "uq_product_categories_product_id_category_id",
+        ),
+        (
+            "SELECT id FROM product_categories "
+            "WHERE product_id = :id AND category_id = :id",
+            "uq_product_categories_product_id_category_id",
+        ),
+    ],
+)
+def test_foreign_key_lookups_use_an_index(app, sql, index):
+    plan = query_plan(app, sql, id=1)
+    assert f"USING INDEX {index}" in plan or f"USING COVERING INDEX {index}" in plan
+    assert "SCAN" not in plan
+
+
+def test_product_category_pairs_are_unique(app, make_product):
+    product_id = make_product()
+    with app.app_context():
+        db.session.execute(text("INSERT INTO categories (name) VALUES ('Watches')"))
+        insert = text(
+            "INSERT INTO product_categories (product_id, category_id) VALUES (:p, 1)"
+        )
+        db.session.execute(insert, {"p": product_id})
+        with pytest.raises(IntegrityError):
+            db.session.execute(insert, {"p": product_id})
+        db.session.rollback()
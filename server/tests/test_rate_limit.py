@@ -0,0 +1,62 @@
+# Behind a reverse proxy every request arrives from the proxy's address. With
+# TRUSTED_PROXIES set, the per-IP login bucket must follow the client address the
+# proxy forwards, so one noisy client cannot lock everyone else out.
+
+import pytest
+from config import create_app, db
+
+
+@pytest.fixture
+def limited_client(tmp_path):
+    apps = []
+
+    def make(trusted_proxies):
+        app = create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+                "CATALOG_CACHE_URL": None,
+                "RATE_LIMIT_STORAGE_URL": None,
+                "RATE_LIMIT_ENABLED": True,
+                "RATE_LIMIT_LOGIN_IP": "2/minute",
+                "BCRYPT_LOG_ROUNDS": 4,
+                "PASSWORD_HASH_WORKERS": 0,
+                "TRUSTED_PROXIES": trusted_proxies,
+            }
+        )
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app.test_client()
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+def login(client, username, forwarded_for):
+    return client.post(
+        "/login",
+        json={"username": username, "password": "wrong"},
+        headers={"X-Forwarded-For": forwarded_for},
+        environ_base={"REMOTE_ADDR": "10.0.0.1"},
+    )
+
+
+def test_login_limit_keys_on_the_forwarded_client(limited_client):
+    client = limited_client(trusted_proxies=1)
+    statuses = [login(client, f"user{i}", "203.0.113.7").status_code for i in range(3)]
+    assert statuses == [401, 401, 429]
+
+    # Another client behind the same proxy keeps its own bucket
+    assert login(client, "user9", "198.51.100.2").status_code == 401
+
+
+def test_forwarded_header_is_ignored_by_default(limited_client):
+    client = limited_client(trusted_proxies=0)
+    statuses = [
+        login(client, f"user{i}", f"203.0.113.{i}").status_code for i in range(3)
+    ]
+    assert statuses == [401, 401, 429]
@@ -0,0 +1,30 @@
+# Orders and the daily sales aggregates are stamped in UTC, so the report's
+# default range must end on the UTC date whatever the server's local time zone.
+
+from datetime import date, datetime, timedelta
+
+import app as app_module
+
+
+# The local date on a host west of UTC shortly after UTC midnight
+class LocalDate(date):
+    @classmethod
+    def today(cls):
+        return datetime.utcnow().date() - timedelta(days=1)
+
+
+def test_default_range_ends_on_the_utc_date(
+    client, make_user, make_product, monkeypatch
+):
+    user_id, product_id = make_user(), make_product()
+    order = {
+        "user_id": user_id,
+        "order_details": [{"product_id": product_id, "quantity": 2}],
+    }
+    assert client.post("/orders", json=order).status_code == 201
+    monkeypatch.setattr(app_module, "date", LocalDate)
+
+    report = client.get("/reports/sales").get_json()
+
+    assert report["end"] == datetime.utcnow().date().isoformat()
+    assert report["units"] == 2
@@ -0,0 +1,63 @@
+# Many checkouts racing for limited stock must sell exactly the stock there is:
+# the conditional stock UPDATE lets every order through or rejects it with 409,
+# and item_quantity never goes below zero.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from config import db
+from models import Order, Product
+
+STOCK = 10
+CHECKOUTS = 40
+
+
+@pytest.fixture
+def shop(make_user, make_product):
+    return make_user(), make_product(item_quantity=STOCK)
+
+
+def place_orders(app, path, bodies):
+    def post(body):
+        return app.test_client().post(path, json=body)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return list(pool.map(post, bodies))
+
+
+def stock_and_orders(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).item_quantity, Order.query.count()
+
+
+def test_concurrent_orders_never_oversell(app, shop):
+    user_id, product_id = shop
+    order = {
+        "user_id": user_id,
+        "order_details": [{"product_id": product_id, "quantity": 1}],
+    }
+
+    responses = place_orders(app, "/orders", [order] * CHECKOUTS)
+
+    statuses = [response.status_code for response in responses]
+    assert statuses.count(201) == STOCK
+    assert statuses.count(409) == CHECKOUTS - STOCK
+    assert stock_and_orders(app, product_id) == (0, STOCK)
+
+
+def test_concurrent_bulk_orders_never_oversell(app, shop):
+    user_id, product_id = shop
+    order = {
+        "user_id": user_id,
+        "order_details": [{"product_id": product_id, "quantity": 1}],
+    }
+
+    responses = place_orders(app, "/orders/bulk", [[order] * 3] * (CHECKOUTS // 3))
+
+    results = [
+        result for response in responses for result in response.get_json()["results"]
+    ]
+    statuses = [result["status"] for result in results]
+    assert statuses.count(201) == STOCK
+    assert set(statuses) <= {201, 409}
+    assert stock_and_orders(app, product_id) == (0, STOCK)
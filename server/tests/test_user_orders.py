@@ -0,0 +1,66 @@
+# Order history pages must cover every order exactly once, including orders that
+# share a created_at and legacy rows whose created_at SQLite stored without
+# fractional seconds.
+
+import pytest
+from config import db
+from sqlalchemy import text
+
+
+@pytest.fixture
+def user_id(app, make_user, make_product):
+    user_id = make_user()
+    make_product()
+    with app.app_context():
+        # The same second in both stored formats, plus one order a day earlier
+        for created_at in [
+            "2026-10-17 00:00:00",
+            "2026-10-17 00:00:00",
+            "2026-10-17 00:00:00.000000",
+            "2026-10-17 12:30:00",
+            "2026-10-17 12:30:00",
+            "2026-10-16 23:59:59.999999",
+        ]:
+            db.session.execute(
+                text(
+                    "INSERT INTO orders (user_id, total, created_at) "
+                    "VALUES (:user_id, 100, :created_at)"
+                ),
+                {"user_id": user_id, "created_at": created_at},
+            )
+        db.session.commit()
+    return user_id
+
+
+def fetch_all(client, user_id, query=""):
+    pages = []
+    after = None
+    while True:
+        cursor = f"&after={after}" if after else ""
+        response = client.get(f"/users/{user_id}/orders?limit=2{query}{cursor}")
+        assert response.status_code == 200
+        data = response.get_json()
+        pages.append([order["id"] for order in data["orders"]])
+        after = data["next_after"]
+        if after is None:
+            return pages
+        assert len(pages) < 10, "paging did not terminate"
+
+
+def test_paging_returns_each_order_once(client, user_id):
+    pages = fetch_all(client, user_id)
+    ids = [id for page in pages for id in page]
+    assert sorted(ids) == list(range(1, 7))
+    assert len(pages) == 3
+    # Newest first, ties broken by id
+    assert ids[:2] == [5, 4]
+
+
+def test_date_bounds_include_whole_days(client, user_id):
+    def ids(query):
+        return sorted(id for page in fetch_all(client, user_id, query) for id in page)
+
+    assert ids("&start=2026-10-17") == [1, 2, 3, 4, 5]
+    assert ids("&end=2026-10-16") == [6]
+    assert ids("&start=2026-10-16&end=2026-10-16") == [6]
+    assert ids("&start=2026-10-17&end=2026-10-17") == [1, 2, 3, 4, 5]
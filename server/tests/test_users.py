@@ -0,0 +1,36 @@
+# A full password hashing queue answers 503 so clients back off and retry; the
+# user handlers must pass it through rather than report a 500.
+
+import pytest
+from config import password_hasher
+from werkzeug.exceptions import ServiceUnavailable
+
+
+def make_hasher_busy(monkeypatch):
+    def run(*args):
+        raise ServiceUnavailable("Too many password checks in progress.")
+
+    monkeypatch.setattr(password_hasher, "_run", run)
+
+
+def test_create_user_when_hashing_is_busy(client, monkeypatch):
+    make_hasher_busy(monkeypatch)
+    response = client.post(
+        "/users",
+        json={"username": "bob", "email": "bob@example.com", "password": "password"},
+    )
+    assert response.status_code == 503
+
+
+@pytest.mark.parametrize(
+    "method, body",
+    [
+        ("patch", {"username": "alice", "password": "password", "newPassword": "new"}),
+        ("delete", {"username": "alice", "password": "password"}),
+    ],
+)
+def test_change_user_when_hashing_is_busy(client, make_user, monkeypatch, method, body):
+    make_user()
+    make_hasher_busy(monkeypatch)
+    response = getattr(client, method)("/users", json=body)
+    assert response.status_code == 503
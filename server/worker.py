@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# worker.py
+# Background worker for the transactional outbox (see outbox.py). Run one or more
+# next to the web server; they share the queue through the database, so no broker
+# is needed. SIGTERM and SIGINT stop a worker after its current batch.
+#
+#   python worker.py
+#   python worker.py --once      # drain what is due, then exit
+#   python worker.py --stats     # print message counts per status
+
+# Standard library imports
+import argparse
+import json
+import logging
+import signal
+import time
+
+# Remote library imports
+from sqlalchemy.exc import OperationalError
+
+# Local imports
+from config import create_app, db
+from models import Order
+from outbox import handler, outbox_stats, process_batch
+
+logger = logging.getLogger("worker")
+
+
+# Post-checkout work for one order. Stands in for the confirmation email, so it
+# only renders the summary that email would carry.
+@handler("order.created")
+def order_created(payload):
+    order = Order.query_with_details().filter_by(id=payload["order_id"]).first()
+    if order is None:
+        # Deleted since; nothing left to confirm
+        return
+    lines = sum(detail.quantity for detail in order.order_details)
+    logger.info(
+        "Order %s confirmed for user %s: %s items, $%.2f",
+        order.id,
+        order.user_id,
+        lines,
+        order.total / 100,
+    )
+
+
+def run(app, once=False):
+    """
+    Processes batches until stopped, sleeping OUTBOX_POLL_INTERVAL seconds while
+    the queue is empty.
+
+    Args:
+    app (Flask): The application, for its database and OUTBOX_* settings.
+    once (bool): Exit as soon as no message is due.
+    """
+    stopping = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.append(True))
+
+    while not stopping:
+        with app.app_context():
+            try:
+                succeeded, failed = process_batch(app.config)
+            except OperationalError as error:
+                # Typically a locked SQLite database while another worker claims
+                db.session.rollback()
+                logger.warning("Polling the outbox failed: %s", error)
+                succeeded, failed = 0, 0
+        if succeeded or failed:
+            logger.info("Processed %s messages, %s failed", succeeded, failed)
+            continue
+        if once:
+            return
+        time.sleep(app.config["OUTBOX_POLL_INTERVAL"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the outbox worker.")
+    parser.add_argument(
+        "--once", action="store_true", help="exit once no message is due"
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="print message counts and exit"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    app = create_app()
+    if args.stats:
+        with app.app_context():
+            print(json.dumps(outbox_stats()))
+        return
+    run(app, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
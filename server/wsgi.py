@@ -0,0 +1,13 @@
+# wsgi.py
+# Production WSGI entry point. Serve it with the settings in gunicorn.conf.py:
+#
+#   gunicorn -c gunicorn.conf.py wsgi:application
+
+from config import create_app
+from sqlalchemy.orm import configure_mappers
+
+application = create_app()
+
+# Resolve the model relationships now rather than on the first query, so a
+# preloading server does it once and its workers inherit the result.
+configure_mappers()